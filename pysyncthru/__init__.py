@@ -1,25 +1,59 @@
 """Connect to a Samsung printer with SyncThru service."""
 
 import asyncio
+import time
+from concurrent.futures import Executor
 from enum import Enum
 from importlib.metadata import version as package_version
-from typing import Any, Dict, Optional, cast
-
-import aiohttp
-import demjson3
-
-from .htmlparsers import ENDPOINT_HTML_PARSERS
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+from urllib.parse import urlsplit
+
+from .cache import ResponseCache
+from .compact import SnapshotCompactor
+from .corpus import RecordedResponse, ResponseRecorder
+from .htmlparsers import ENDPOINT_HTML_HOME, ENDPOINT_HTML_PARSERS, parse_html_page
+from .payloads import LazyCounters, decode_json_payload
+from .profiles import EndpointProfile, ProfileRegistry, merge_page, page_has_data
+from .ratelimit import RateLimiter
+from .snmp import SnmpClient, SnmpError, fetch_printer
+from .transport import AiohttpTransport, ConnectionDropped, Transport, TransportError
+
+if TYPE_CHECKING:
+    import aiohttp
 
 ENDPOINT_API_BASE = "/sws/app/information"
 PRINTER_ENDPOINT = "/home/home.json"
 COUNTER_ENDPOINT = "/counters/counters.json"
+# Responses larger than this are discarded
+DEFAULT_MAX_RESPONSE_SIZE = 4 * 1024 * 1024
+# Encoding assumed as long as a printer did not send a charset
+DEFAULT_ENCODING = "utf-8"
+FALLBACK_ENCODING = "latin-1"
+# Payloads smaller than this are decoded on the event loop
+DEFAULT_OFFLOAD_THRESHOLD = 64 * 1024
+# Seconds the JSON API may answer after the HTML home page and still win a race
+RACE_GRACE_PERIOD = 0.5
 __version__ = package_version("pysyncthru")
 
+_T = TypeVar("_T")
+
 
 class ConnectionMode(Enum):
     AUTO = -1
     API = 1
     HTML = 2
+    SNMP = 3
 
 
 class SyncthruState(Enum):
@@ -41,6 +75,13 @@ def construct_url(ip_address: str) -> str:
     return ip_address
 
 
+class ProbeResult(NamedTuple):
+    connection_mode: ConnectionMode
+    data: Dict[str, Any]
+    # the JSON API answered without a valid SyncThru payload
+    api_unsupported: bool
+
+
 class SyncThruAPINotSupported(Exception):
     """Error raised when a printer does not provide access to a JSON based API."""
 
@@ -56,79 +97,305 @@ class SyncThru:
     def __init__(
         self,
         ip: str,
-        session: aiohttp.ClientSession,
+        session: Union["aiohttp.ClientSession", Transport],
         connection_mode: ConnectionMode = ConnectionMode.AUTO,
+        min_refresh_interval: float = 0.0,
+        cache: Optional[ResponseCache] = None,
+        max_response_size: int = DEFAULT_MAX_RESPONSE_SIZE,
+        executor: Optional[Executor] = None,
+        offload_threshold: int = DEFAULT_OFFLOAD_THRESHOLD,
+        recorder: Optional[ResponseRecorder] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        compactor: Optional[SnapshotCompactor] = None,
+        snmp_client: Optional[SnmpClient] = None,
+        max_age: Optional[float] = None,
+        stale_while_revalidate: float = 0.0,
+        profiles: Optional[ProfileRegistry] = None,
+        race_detection: bool = False,
     ) -> None:
-        """Initialize the printer."""
+        """
+        Initialize the printer.
+
+        Requests are sent through ``session``, either an aiohttp client
+        session or a :class:`pysyncthru.transport.Transport`.
+
+        Calls to update within ``min_refresh_interval`` seconds after the last
+        refresh keep the cached data. Responses are shared with other
+        instances through the optional ``cache``. Responses larger than
+        ``max_response_size`` bytes are treated as missing.
+        Decoding and parsing of responses of at least ``offload_threshold``
+        characters runs in the optional ``executor`` (thread or process pool)
+        instead of blocking the event loop.
+        All responses are saved with the optional ``recorder``, a
+        ``ReplaySession`` transport can serve them again.
+        Requests are paced by the optional ``rate_limiter``, which is
+        usually shared by all printers.
+        Printer data is compacted with the optional ``compactor``, which
+        shares repeated strings and records between printers sharing it.
+        With ``ConnectionMode.SNMP`` the printer is queried over SNMP instead
+        of HTTP, through ``snmp_client`` if given, which is usually shared by
+        all printers.
+        With ``max_age``, reading data older than ``max_age`` seconds starts a
+        refresh in the background while the stale data is returned. Calls to
+        update return immediately as long as the data is at most
+        ``stale_while_revalidate`` seconds older than ``max_age``.
+        In HTML mode, the optional ``profiles`` registry learns which pages
+        printers of a model serve and how often pages are requested.
+        With ``race_detection``, ``ConnectionMode.AUTO`` probes the JSON API
+        and the HTML home page at the same time on first contact. A JSON API
+        probe slower than the HTML page completes in the background. Only
+        HTML pages are requested once the JSON API turned out to be
+        unsupported.
+        """
         self.url = construct_url(ip)
-        self._session = session
-        self.data_printer_status: Dict[str, Any] = {}
-        self.data_counter_status: Dict[str, Any] = {}
+        self._transport = (
+            session if isinstance(session, Transport) else AiohttpTransport(session)
+        )
+        self._data_printer_status: Dict[str, Any] = {}
+        # decoded lazily, see data_counter_status for the decoded dict
+        self._counters: Union[LazyCounters, Dict[str, Any]] = {}
         self.connection_mode = connection_mode
+        self._cache = cache
+        # cleared when the printer breaks on reused connections
+        self._keep_alive = True
+        self.max_response_size = max_response_size
+        # learned from the Content-Type header or failed decoding
+        self._encoding = DEFAULT_ENCODING
+        self._executor = executor
+        self.offload_threshold = offload_threshold
+        self._recorder = recorder
+        self._rate_limiter = rate_limiter
+        self._compactor = compactor
+        self._snmp_client = snmp_client
+        self._host = urlsplit(self.url).hostname or self.url
+        self.min_refresh_interval = min_refresh_interval
+        self._profiles = profiles
+        self.race_detection = race_detection
+        # cleared after the first race, whatever its outcome
+        self._race_pending = race_detection
+        # HTML once the race ruled out the JSON API of a printer in AUTO mode
+        self._detected_mode: Optional[ConnectionMode] = None
+        # JSON API probe that lost the race and completes in the background
+        self._api_probe: Optional["asyncio.Future[Optional[Dict[str, Any]]]"] = None
+        # parsed pages reused within their interval, with the time of request
+        self._html_pages: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self._last_update: Optional[float] = None
+        self._update_task: Optional["asyncio.Future[None]"] = None
 
     async def update(self) -> None:
-        """Retrieve and cache printer and counter data from SyncThru."""
-        self.data_printer_status = await self._current_printer_data()
-        self.data_counter_status = await self._current_counter_data()
+        """
+        Retrieve and cache printer and counter data from SyncThru.
+
+        Concurrent calls are coalesced onto a single refresh.
+        """
+        age = self.age()
+        if age is not None:
+            if self._update_task is None and age < self.min_refresh_interval:
+                return
+            if (
+                self.max_age is not None
+                and age <= self.max_age + self.stale_while_revalidate
+            ):
+                if age >= self.max_age:
+                    self._start_refresh()
+                return
+        # shielded so that a cancelled caller does not cancel the other callers
+        await asyncio.shield(self._start_refresh())
+
+    def age(self) -> Optional[float]:
+        """Return the seconds since the last refresh, None before the first."""
+        if self._last_update is None:
+            return None
+        return time.monotonic() - self._last_update
+
+    def _start_refresh(self) -> "asyncio.Future[None]":
+        if self._update_task is None:
+            self._update_task = asyncio.ensure_future(self._refresh())
+            self._update_task.add_done_callback(self._update_done)
+        return self._update_task
+
+    def _revalidate(self) -> None:
+        """Refresh stale data in the background if an event loop is running."""
+        if self.max_age is None or self._update_task is not None:
+            return
+        age = self.age()
+        if age is not None and age < self.max_age:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._start_refresh()
+
+    @property
+    def _mode(self) -> ConnectionMode:
+        """The connection mode in effect, the configured one unless detected."""
+        if self._detected_mode is not None:
+            return self._detected_mode
+        return self.connection_mode
+
+    @property
+    def data_printer_status(self) -> Dict[str, Any]:
+        """Printer data, stale data is refreshed in the background."""
+        self._revalidate()
+        return self._data_printer_status
+
+    @data_printer_status.setter
+    def data_printer_status(self, value: Dict[str, Any]) -> None:
+        self._data_printer_status = value
+
+    async def _refresh(self) -> None:
+        data_counter_status: Union[LazyCounters, Dict[str, Any]]
+        if self.connection_mode == ConnectionMode.SNMP:
+            data_printer_status, data_counter_status = await self._current_snmp_data()
+        else:
+            data_printer_status = await self._current_printer_data()
+            data_counter_status = await self._current_counter_data()
+        if self._compactor is not None:
+            data_printer_status = self._compactor.compact(data_printer_status)
+        self.data_printer_status = data_printer_status
+        self._counters = data_counter_status
+        self._last_update = time.monotonic()
+
+    def _update_done(self, task: "asyncio.Future[None]") -> None:
+        self._update_task = None
+        if not task.cancelled():
+            # errors are raised to the callers of update
+            task.exception()
+
+    async def _get_endpoint(self, endpoint: str) -> Optional[str]:
+        if self._cache is not None:
+            cached = self._cache.get(self.url, endpoint)
+            if cached is not None:
+                return cached
+        start = time.monotonic()
+        text = await self._get_text(f"{self.url}{endpoint}")
+        if self._recorder is not None:
+            self._recorder.record(
+                RecordedResponse(
+                    self.url, endpoint, text, time.monotonic() - start, time.time()
+                )
+            )
+        if text is not None and self._cache is not None:
+            self._cache.put(self.url, endpoint, text)
+        return text
 
     async def _get_text(self, url: str) -> Optional[str]:
         try:
-            async with self._session.get(url) as response:
-                text: str = await response.text()
-                return text
-        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return await self._request_text(url)
+        except ConnectionDropped:
+            if not self._keep_alive:
+                return None
+            # The printer dropped a (possibly reused) connection,
+            # retry once and do not reuse connections from now on
+            self._keep_alive = False
+        except TransportError:
             return None
-
-    def _decode_json_payload(self, res_raw: str) -> Optional[Dict[str, Any]]:
         try:
-            return cast(Dict[str, Any], demjson3.decode(res_raw))
-        except demjson3.JSONDecodeError as e:
-            error_msg = (
-                "Line terminator characters must be escaped inside string literals"
-            )
-            if error_msg in str(e):
-                # Escape \r and \n inside string literals in the raw payload.
-                new_res_raw = ""
-                inside_literal = False
-                for char in res_raw:
-                    if char == '"':
-                        inside_literal = not inside_literal
-                    if char in ("\r", "\n") and inside_literal:
-                        new_res_raw += "\\"
-                    new_res_raw += char
-                try:
-                    return cast(Dict[str, Any], demjson3.decode(new_res_raw))
-                except demjson3.JSONDecodeError:
-                    return None
+            return await self._request_text(url)
+        except TransportError:
+            return None
+
+    async def _request_text(self, url: str) -> Optional[str]:
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire(self._host)
+        response = await self._transport.get(
+            url, self.max_response_size, self._keep_alive
+        )
+        if self._rate_limiter is not None:
+            self._rate_limiter.consume_bytes(self._host, response.received)
+        if response.body is None:
             return None
+        return self._decode_body(response.body, response.charset)
+
+    def _decode_body(self, body: bytes, charset: Optional[str]) -> str:
+        if charset is not None:
+            try:
+                text = body.decode(charset)
+                self._encoding = charset
+                return text
+            except (LookupError, UnicodeDecodeError):
+                pass
+        try:
+            return body.decode(self._encoding)
+        except (LookupError, UnicodeDecodeError):
+            # latin-1 decodes any byte sequence
+            self._encoding = FALLBACK_ENCODING
+            return body.decode(FALLBACK_ENCODING)
+
+    def _decode_json_payload(self, res_raw: str) -> Optional[Dict[str, Any]]:
+        return decode_json_payload(res_raw)
+
+    async def _offload(self, size: int, func: Callable[..., _T], *args: Any) -> _T:
+        """Run CPU bound work in the executor if the input is large enough."""
+        if self._executor is None or size < self.offload_threshold:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
 
     async def _current_printer_data(self) -> Dict[str, Any]:
         """Retrieve printer status data from API and fallback to HTML scraping."""
-        data = {"status": {"hrDeviceStatus": SyncthruState.OFFLINE.value}}
-
-        if self.connection_mode in [ConnectionMode.AUTO, ConnectionMode.API]:
-            printer_url = f"{self.url}{ENDPOINT_API_BASE}{PRINTER_ENDPOINT}"
-            res_raw = await self._get_text(printer_url)
+        data: Dict[str, Any] = {
+            "status": {"hrDeviceStatus": SyncthruState.OFFLINE.value}
+        }
+        # pages already requested while detecting the connection mode
+        prefetched: Dict[str, Dict[str, Any]] = {}
+
+        if self._mode == ConnectionMode.AUTO and self._race_pending:
+            self._race_pending = False
+            detected = await self._race_connection_modes(detect_in_background=True)
+            # without a valid response, fall back to the sequential detection
+            if detected is not None:
+                if detected.connection_mode == ConnectionMode.API:
+                    return detected.data
+                if detected.api_unsupported:
+                    self._detected_mode = ConnectionMode.HTML
+                prefetched[ENDPOINT_HTML_HOME] = detected.data
+
+        mode = self._mode
+        if not prefetched and mode in [
+            ConnectionMode.AUTO,
+            ConnectionMode.API,
+        ]:
+            res_raw = await self._get_endpoint(f"{ENDPOINT_API_BASE}{PRINTER_ENDPOINT}")
             if res_raw is not None:
-                res = self._decode_json_payload(res_raw)
+                res = await self._offload(len(res_raw), decode_json_payload, res_raw)
                 if res is not None:
                     return res
-                if self.connection_mode == ConnectionMode.API:
+                if mode == ConnectionMode.API:
                     raise SyncThruAPINotSupported(
                         "Invalid host, does not support SyncThru JSON API."
                     )
 
-        if self.connection_mode in [ConnectionMode.AUTO, ConnectionMode.HTML]:
+        if mode in [ConnectionMode.AUTO, ConnectionMode.HTML]:
             any_connection_successful = False
-            for endpoint_url, parsers in ENDPOINT_HTML_PARSERS.items():
-                html_url = f"{self.url}{endpoint_url}"
-                html_res = await self._get_text(html_url)
-                if html_res is None:
+            profile: Optional[EndpointProfile] = None
+            for endpoint_url in ENDPOINT_HTML_PARSERS:
+                if profile is None and self._profiles is not None:
+                    # the model name is known once the home page is parsed
+                    model = data.get("identity", {}).get("model_name")
+                    if model:
+                        profile = self._profiles.profile(model)
+                if profile is not None and not profile.serves(endpoint_url):
                     continue
+                # reused only while the printer is reachable
+                page = (
+                    self._reusable_page(endpoint_url)
+                    if any_connection_successful
+                    else None
+                )
+                if page is None:
+                    page = prefetched.pop(endpoint_url, None)
+                    if page is None:
+                        page = await self._fetch_page(endpoint_url)
+                    if page is None:
+                        continue
 
-                any_connection_successful = True
-                for parser in parsers:
-                    parser(data).feed(html_res)
+                    any_connection_successful = True
+                    self._store_page(endpoint_url, page, profile)
+                data = merge_page(data, page)
 
             if (
                 any_connection_successful
@@ -138,13 +405,127 @@ class SyncThru:
 
         return data
 
-    async def _current_counter_data(self) -> Dict[str, Any]:
+    async def _fetch_page(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        html_res = await self._get_endpoint(endpoint)
+        if html_res is None:
+            return None
+        return await self._offload(
+            len(html_res), parse_html_page, endpoint, html_res, {}
+        )
+
+    async def _probe_api(self) -> Optional[Dict[str, Any]]:
+        """Return the decoded JSON home endpoint if the API is supported."""
+        res_raw = await self._get_endpoint(f"{ENDPOINT_API_BASE}{PRINTER_ENDPOINT}")
+        if res_raw is None:
+            return None
+        return await self._offload(len(res_raw), decode_json_payload, res_raw)
+
+    async def _probe_html(self) -> Optional[Dict[str, Any]]:
+        """Return the parsed HTML home page if it names the printer model."""
+        page = await self._fetch_page(ENDPOINT_HTML_HOME)
+        if page is None or not page.get("identity", {}).get("model_name"):
+            return None
+        return page
+
+    async def _race_connection_modes(
+        self, detect_in_background: bool = False
+    ) -> Optional[ProbeResult]:
+        """
+        Probe the JSON API and the HTML home page concurrently.
+
+        A valid JSON response wins, a valid HTML page only if the JSON API
+        failed or did not answer within ``RACE_GRACE_PERIOD`` seconds.
+        The other probe is cancelled. With ``detect_in_background``, a JSON
+        API probe that lost the race completes instead, and only HTML pages
+        are requested if it fails. None if neither response is valid.
+        """
+        api = asyncio.ensure_future(self._probe_api())
+        html = asyncio.ensure_future(self._probe_html())
+        keep_api = False
+        try:
+            await asyncio.wait({api, html}, return_when=asyncio.FIRST_COMPLETED)
+            if not api.done() and html.result() is not None:
+                # JSON capable printers often serve the home page faster
+                await asyncio.wait({api}, timeout=RACE_GRACE_PERIOD)
+            if api.done():
+                data = api.result()
+                if data is not None:
+                    return ProbeResult(ConnectionMode.API, data, False)
+                page = await html
+                if page is None:
+                    return None
+                return ProbeResult(ConnectionMode.HTML, page, True)
+            page = html.result()
+            if page is not None:
+                if detect_in_background:
+                    keep_api = True
+                    self._api_probe = api
+                    api.add_done_callback(self._api_probed)
+                return ProbeResult(ConnectionMode.HTML, page, False)
+            data = await api
+            if data is None:
+                return None
+            return ProbeResult(ConnectionMode.API, data, False)
+        finally:
+            if not keep_api:
+                api.cancel()
+            html.cancel()
+
+    def _api_probed(self, probe: "asyncio.Future[Optional[Dict[str, Any]]]") -> None:
+        self._api_probe = None
+        if probe.cancelled() or probe.exception() is not None:
+            return
+        if probe.result() is None:
+            self._detected_mode = ConnectionMode.HTML
+
+    def _reusable_page(self, endpoint: str) -> Optional[Dict[str, Any]]:
+        """Return the last data of a page if it is within its interval."""
+        cached = self._html_pages.get(endpoint)
+        if cached is None or self._profiles is None:
+            return None
+        if self._profiles.clock() - cached[0] >= self._profiles.interval(endpoint):
+            return None
+        return cached[1]
+
+    def _store_page(
+        self, endpoint: str, page: Dict[str, Any], profile: Optional[EndpointProfile]
+    ) -> None:
+        if profile is not None:
+            profile.record(endpoint, page_has_data(page))
+        if self._profiles is not None and self._profiles.interval(endpoint) > 0:
+            self._html_pages[endpoint] = (self._profiles.clock(), page)
+
+    async def _current_snmp_data(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Retrieve printer status and counter data over SNMP."""
+        try:
+            if self._snmp_client is not None:
+                return await fetch_printer(self._snmp_client, self._host)
+            async with SnmpClient() as client:
+                return await fetch_printer(client, self._host)
+        except (asyncio.TimeoutError, OSError, SnmpError):
+            return {"status": {"hrDeviceStatus": SyncthruState.OFFLINE.value}}, {}
+
+    @property
+    def data_counter_status(self) -> Dict[str, Any]:
+        """Counter data, decoded completely on first access."""
+        self._revalidate()
+        if isinstance(self._counters, LazyCounters):
+            return self._counters.decode_all()
+        return self._counters
+
+    @data_counter_status.setter
+    def data_counter_status(self, value: Dict[str, Any]) -> None:
+        self._counters = value
+
+    async def _current_counter_data(self) -> Union[LazyCounters, Dict[str, Any]]:
         """Retrieve counter data from API if available."""
-        if self.connection_mode in [ConnectionMode.AUTO, ConnectionMode.API]:
-            counter_url = f"{self.url}{ENDPOINT_API_BASE}{COUNTER_ENDPOINT}"
-            res_raw = await self._get_text(counter_url)
+        if self._mode in [ConnectionMode.AUTO, ConnectionMode.API]:
+            res_raw = await self._get_endpoint(f"{ENDPOINT_API_BASE}{COUNTER_ENDPOINT}")
             if res_raw is not None:
-                res = self._decode_json_payload(res_raw)
+                counters = LazyCounters.from_payload(res_raw)
+                if counters is not None:
+                    return counters
+                res = await self._offload(len(res_raw), decode_json_payload, res_raw)
                 if res is not None:
                     return res
 
@@ -300,8 +681,10 @@ class SyncThru:
 
     def print_count(self) -> Any:
         """Return total print counter from SyncThru counters endpoint."""
-        return self.data_counter_status.get("GXI_BILLING_PRINT_TOTAL_IMP_CNT")
+        self._revalidate()
+        return self._counters.get("GXI_BILLING_PRINT_TOTAL_IMP_CNT")
 
     def copy_count(self) -> Any:
         """Return total copy counter from SyncThru counters endpoint."""
-        return self.data_counter_status.get("GXI_BILLING_COPY_TOTAL_IMP_CNT")
+        self._revalidate()
+        return self._counters.get("GXI_BILLING_COPY_TOTAL_IMP_CNT")
@@ -0,0 +1,129 @@
+"""Per-interval counter deltas with incremental rollups over a hierarchy."""
+
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from . import SyncThru
+
+BILLING_PREFIX = "GXI_BILLING_"
+
+Group = Tuple[str, ...]
+
+
+class CounterDelta(NamedTuple):
+    host: str
+    counter: str
+    delta: int
+    # the counter went backwards, the delta counts from zero
+    reset: bool
+
+
+class _Device(NamedTuple):
+    serial_number: Optional[str]
+    counters: Dict[str, int]
+
+
+class AccountingEngine:
+    """
+    Turn successive counter snapshots into deltas and roll them up.
+
+    ``hierarchy`` maps a host to its groups, e.g. ``("site", "department")``.
+    Deltas are added to every enclosing group, the printer itself
+    (``(*groups, host)``) and the whole fleet (``()``), so totals are looked
+    up in constant time.
+    A counter lower than before was reset by the device and counts from
+    zero. If the serial number of a host changes, the printer was swapped
+    and its counters only serve as the new baseline.
+    """
+
+    def __init__(
+        self,
+        hierarchy: Callable[[str], Sequence[str]] = lambda host: (),
+        counters: Optional[Collection[str]] = None,
+    ) -> None:
+        self.hierarchy = hierarchy
+        self.counters = None if counters is None else frozenset(counters)
+        self._devices: Dict[str, _Device] = {}
+        self._groups: Dict[str, List[Group]] = {}
+        self._totals: Dict[Group, Dict[str, int]] = {}
+
+    def _tracked(self, counters: Mapping[str, Any]) -> Dict[str, int]:
+        return {
+            name: value
+            for name, value in counters.items()
+            if type(value) is int
+            and (
+                name.startswith(BILLING_PREFIX)
+                if self.counters is None
+                else name in self.counters
+            )
+        }
+
+    def _enclosing_groups(self, host: str) -> List[Group]:
+        groups = self._groups.get(host)
+        if groups is None:
+            path = tuple(self.hierarchy(host))
+            groups = [path[:i] for i in range(len(path) + 1)]
+            groups.append((*path, host))
+            self._groups[host] = groups
+        return groups
+
+    def record(
+        self,
+        host: str,
+        counters: Mapping[str, Any],
+        serial_number: Optional[str] = None,
+    ) -> List[CounterDelta]:
+        """Account for a counter snapshot, returns the deltas since the last."""
+        values = self._tracked(counters)
+        if not values:
+            # e.g. the printer was offline
+            return []
+        previous = self._devices.get(host)
+        self._devices[host] = _Device(serial_number, values)
+        if previous is None or (
+            serial_number is not None
+            and previous.serial_number is not None
+            and serial_number != previous.serial_number
+        ):
+            return []
+
+        deltas = []
+        for name, value in values.items():
+            last = previous.counters.get(name)
+            if last is None or value == last:
+                continue
+            reset = value < last
+            deltas.append(
+                CounterDelta(host, name, value if reset else value - last, reset)
+            )
+        for group in self._enclosing_groups(host):
+            totals = self._totals.setdefault(group, {})
+            for delta in deltas:
+                totals[delta.counter] = totals.get(delta.counter, 0) + delta.delta
+        return deltas
+
+    def record_printer(self, printer: SyncThru) -> List[CounterDelta]:
+        return self.record(printer.url, printer.raw_counter(), printer.serial_number())
+
+    def total(self, counter: str, group: Group = ()) -> int:
+        """Sum of the deltas of a counter within a group."""
+        return self._totals.get(group, {}).get(counter, 0)
+
+    def totals(self, group: Group = ()) -> Dict[str, int]:
+        return dict(self._totals.get(group, {}))
+
+    def close_period(self) -> Dict[Group, Dict[str, int]]:
+        """Return the totals of all groups and start a new billing period."""
+        totals, self._totals = self._totals, {}
+        return totals
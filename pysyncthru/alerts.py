@@ -0,0 +1,230 @@
+"""Incremental evaluation of alert rules over the printers of a fleet."""
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from . import SyncThru, SyncthruState
+
+FieldPath = Tuple[str, ...]
+
+_STATUS: FieldPath = ("status", "hrDeviceStatus")
+
+
+class AlertRule:
+    """
+    Alert raised when ``raise_when`` holds for the values of ``fields``.
+
+    The values are passed in the order of ``fields``. While a value is
+    missing or the printer is offline, the rule is not evaluated and keeps its
+    state. An active alert is only cleared once ``clear_when`` holds, which
+    allows hysteresis (it defaults to the negation of ``raise_when``).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fields: Sequence[FieldPath],
+        raise_when: Callable[..., bool],
+        clear_when: Optional[Callable[..., bool]] = None,
+    ) -> None:
+        self.name = name
+        self.fields = tuple(fields)
+        self.raise_when = raise_when
+        self.clear_when: Callable[..., bool] = (
+            clear_when
+            if clear_when is not None
+            else (lambda *values: not raise_when(*values))
+        )
+
+
+class AlertEvent(NamedTuple):
+    host: str
+    rule: str
+    # True if the alert was raised, False if it was cleared
+    active: bool
+
+
+def _below(threshold: float) -> Callable[[Any, Any], bool]:
+    return lambda opt, remaining: (
+        bool(opt) and isinstance(remaining, (int, float)) and remaining < threshold
+    )
+
+
+def toner_low_rule(color: str, threshold: float = 10, clear: float = 15) -> AlertRule:
+    """Toner below ``threshold`` percent, cleared at ``clear`` percent."""
+    key = f"{SyncThru.TONER}_{color}"
+    return AlertRule(
+        f"{key}_low",
+        [(key, "opt"), (key, "remaining")],
+        _below(threshold),
+        lambda opt, remaining: not _below(clear)(opt, remaining),
+    )
+
+
+def drum_low_rule(color: str, threshold: float = 10, clear: float = 15) -> AlertRule:
+    """Drum below ``threshold`` percent of its life, cleared at ``clear``."""
+    key = f"{SyncThru.DRUM}_{color}"
+    return AlertRule(
+        f"{key}_low",
+        [(key, "opt"), (key, "remaining")],
+        _below(threshold),
+        lambda opt, remaining: not _below(clear)(opt, remaining),
+    )
+
+
+def device_error_rule() -> AlertRule:
+    """Printer reports an error state."""
+    return AlertRule(
+        "device_error",
+        [_STATUS],
+        lambda status: status == SyncthruState.ERROR.value,
+    )
+
+
+def tray_error_rule(tray: str) -> AlertRule:
+    """Installed tray reports an error, e.g. because it is empty."""
+    return AlertRule(
+        f"{tray}_error",
+        [(tray, "opt"), (tray, "newError")],
+        lambda opt, error: opt == 1 and error not in (None, "", "0"),
+    )
+
+
+def default_rules() -> List[AlertRule]:
+    return [
+        device_error_rule(),
+        *(toner_low_rule(color) for color in SyncThru.COLOR_NAMES),
+        *(drum_low_rule(color) for color in SyncThru.COLOR_NAMES),
+        *(tray_error_rule(f"{SyncThru.TRAY}{i}") for i in range(1, 6)),
+        tray_error_rule("mp"),
+        tray_error_rule("manual"),
+    ]
+
+
+def _lookup(data: Dict[str, Any], path: FieldPath) -> Any:
+    value: Any = data
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+class AlertEngine:
+    """
+    Evaluate alert rules for many printers.
+
+    Rules are indexed by the fields they read. For each printer only rules
+    with changed fields are evaluated. Fields are only looked up if their
+    top-level record is not the identical object as in the last evaluation,
+    so with a ``SnapshotCompactor`` sharing unchanged records, unchanged
+    printers cost one identity check per record. Events are only emitted
+    when an alert is raised or cleared.
+    """
+
+    def __init__(self, rules: Optional[Iterable[AlertRule]] = None) -> None:
+        self.rules = list(default_rules() if rules is None else rules)
+        self._fields: List[FieldPath] = []
+        self._fields_by_record: Dict[str, List[FieldPath]] = {}
+        self._rules_by_field: Dict[FieldPath, List[AlertRule]] = {}
+        for rule in self.rules:
+            for field in rule.fields:
+                if field not in self._rules_by_field:
+                    self._fields.append(field)
+                    # the empty path reads the whole data
+                    key = field[0] if field else ""
+                    self._fields_by_record.setdefault(key, []).append(field)
+                    self._rules_by_field[field] = []
+                self._rules_by_field[field].append(rule)
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._values: Dict[str, Dict[FieldPath, Any]] = {}
+        self._active: Dict[str, Set[str]] = {}
+
+    def evaluate(
+        self, host: str, data_printer_status: Dict[str, Any]
+    ) -> List[AlertEvent]:
+        """Evaluate the rules affected by changes of a printer's data."""
+        if self._data.get(host) is data_printer_status:
+            return []
+        self._data[host] = data_printer_status
+        records = {
+            key: data_printer_status.get(key) if key else data_printer_status
+            for key in self._fields_by_record
+        }
+        previous = self._records.get(host)
+        self._records[host] = records
+        values = self._values.get(host)
+        if previous is None or values is None:
+            values = self._values[host] = {
+                field: _lookup(data_printer_status, field) for field in self._fields
+            }
+            rules: Iterable[AlertRule] = self.rules
+        else:
+            affected: Dict[int, AlertRule] = {}
+            for key, record in records.items():
+                if record is previous[key]:
+                    continue
+                for field in self._fields_by_record[key]:
+                    value = _lookup(data_printer_status, field)
+                    if values[field] != value:
+                        values[field] = value
+                        for rule in self._rules_by_field[field]:
+                            affected[id(rule)] = rule
+            rules = affected.values()
+            if not affected:
+                return []
+        status = (
+            values[_STATUS]
+            if _STATUS in values
+            else _lookup(data_printer_status, _STATUS)
+        )
+        if status == SyncthruState.OFFLINE.value:
+            # rules changed while offline are evaluated once it is back
+            return []
+
+        active = self._active.setdefault(host, set())
+        events = []
+        for rule in rules:
+            args = [values[field] for field in rule.fields]
+            if any(arg is None for arg in args):
+                continue
+            if rule.name in active:
+                if rule.clear_when(*args):
+                    active.discard(rule.name)
+                    events.append(AlertEvent(host, rule.name, False))
+            elif rule.raise_when(*args):
+                active.add(rule.name)
+                events.append(AlertEvent(host, rule.name, True))
+        return events
+
+    def evaluate_printer(self, printer: SyncThru) -> List[AlertEvent]:
+        return self.evaluate(printer.url, printer.data_printer_status)
+
+    def evaluate_fleet(self, printers: Iterable[SyncThru]) -> List[AlertEvent]:
+        events = []
+        for printer in printers:
+            events.extend(self.evaluate_printer(printer))
+        return events
+
+    def active_alerts(self, host: str) -> Set[str]:
+        """Return the names of the alerts currently raised for a printer."""
+        return set(self._active.get(host, ()))
+
+    def forget(self, host: str) -> None:
+        """Drop all state of a printer, e.g. when it leaves the fleet."""
+        self._data.pop(host, None)
+        self._records.pop(host, None)
+        self._values.pop(host, None)
+        self._active.pop(host, None)
@@ -0,0 +1,88 @@
+"""Response cache that can be shared between SyncThru instances."""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from .htmlparsers import ENDPOINT_HTML_GENERAL_PROTOCOLS
+
+DEFAULT_TTL = 5.0
+DEFAULT_MAX_ENTRIES = 1024
+# Identity pages barely ever change, status pages do
+DEFAULT_ENDPOINT_TTLS: Dict[str, float] = {
+    ENDPOINT_HTML_GENERAL_PROTOCOLS: 3600.0,
+}
+
+
+class CacheStatistics(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class ResponseCache:
+    """
+    LRU cache of printer responses with a time to live per endpoint.
+
+    Entries are keyed by the printer URL (as returned by ``construct_url``)
+    and the endpoint path.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        default_ttl: float = DEFAULT_TTL,
+        endpoint_ttls: Optional[Mapping[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.endpoint_ttls: Dict[str, float] = dict(
+            DEFAULT_ENDPOINT_TTLS if endpoint_ttls is None else endpoint_ttls
+        )
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def ttl(self, endpoint: str) -> float:
+        """Return the time to live of responses of the given endpoint."""
+        return self.endpoint_ttls.get(endpoint, self.default_ttl)
+
+    def get(self, url: str, endpoint: str) -> Optional[str]:
+        """Return the cached response or None if it is missing or expired."""
+        key = (url, endpoint)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            del self._entries[key]
+        self._misses += 1
+        return None
+
+    def put(self, url: str, endpoint: str, response: str) -> None:
+        """Store a response, evicting the least recently used ones if full."""
+        key = (url, endpoint)
+        self._entries[key] = (self._clock() + self.ttl(endpoint), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries, statistics are kept."""
+        self._entries.clear()
+
+    def statistics(self) -> CacheStatistics:
+        """Return hit, miss and eviction counts and the current size."""
+        return CacheStatistics(
+            self._hits, self._misses, self._evictions, len(self._entries)
+        )
+
+
+# Process wide cache to share responses between all SyncThru instances
+SHARED_CACHE = ResponseCache()
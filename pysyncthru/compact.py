@@ -0,0 +1,127 @@
+"""Interning and sharing of repeated structure in printer snapshots."""
+
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+DEFAULT_MAX_ENTRIES = 65536
+DEFAULT_MAX_STRING_LENGTH = 64
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class SnapshotCompactor:
+    """
+    Compact decoded snapshots by interning keys and short strings and by
+    sharing structurally identical records (dicts of scalar values).
+
+    One compactor can be shared by many printers, records are then shared
+    between printers and between successive snapshots. Compacted snapshots
+    must be treated as read-only. At most ``max_entries`` canonical records
+    are kept, the least recently used are evicted first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_string_length: int = DEFAULT_MAX_STRING_LENGTH,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_string_length = max_string_length
+        self._records: "OrderedDict[Tuple[Tuple[str, Any], ...], Dict[str, Any]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _string(self, value: str) -> str:
+        if type(value) is str and len(value) <= self.max_string_length:
+            return sys.intern(value)
+        return value
+
+    def compact(self, value: Any) -> Any:
+        """Return a compacted value equal to ``value``."""
+        if isinstance(value, str):
+            return self._string(value)
+        if isinstance(value, list):
+            return [self.compact(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        record = {self._string(k): self.compact(v) for k, v in value.items()}
+        if not all(isinstance(v, _SCALARS) for v in record.values()):
+            return record
+        # the type distinguishes e.g. 1, 1.0 and True, which compare equal
+        key = tuple((k, (type(v), v)) for k, v in record.items())
+        canonical = self._records.get(key)
+        if canonical is not None:
+            self._records.move_to_end(key)
+            return canonical
+        self._records[key] = record
+        # records of values changing every poll are evicted soon
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+        return record
+
+    def clear(self) -> None:
+        self._records.clear()
+
+
+def deep_sizeof(value: Any, seen: Optional[Set[int]] = None) -> int:
+    """Size in bytes of a value and all objects it references, counted once."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += deep_sizeof(item, seen)
+    return size
+
+
+def benchmark_memory(payloads: Iterable[str], copies: int = 1000) -> Tuple[int, int]:
+    """
+    Decode ``copies`` snapshots of each JSON payload as separate printers
+    would, returns the size per printer without and with compaction.
+    """
+    from .payloads import decode_json_payload
+
+    texts = list(payloads)
+    printers = copies * len(texts)
+    if not printers:
+        return 0, 0
+    plain = [decode_json_payload(text) for text in texts for _ in range(copies)]
+    plain_size = deep_sizeof(plain)
+    del plain
+    compactor = SnapshotCompactor()
+    compacted = [
+        compactor.compact(decode_json_payload(text))
+        for text in texts
+        for _ in range(copies)
+    ]
+    return plain_size // printers, deep_sizeof(compacted) // printers
+
+
+if __name__ == "__main__":
+    from .corpus import load_corpus
+
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: {sys.argv[0]} CORPUS [COPIES]", file=sys.stderr)
+        sys.exit(1)
+    copies = int(sys.argv[2]) if len(sys.argv) == 3 else 1000
+    bodies = [
+        response.body
+        for response in load_corpus(sys.argv[1])
+        if response.body is not None and response.endpoint.endswith("home.json")
+    ]
+    plain_size, compacted_size = benchmark_memory(bodies, copies)
+    print(
+        f"{plain_size} bytes per printer, {compacted_size} bytes compacted "
+        f"({compacted_size / max(plain_size, 1):.0%})"
+    )
@@ -0,0 +1,172 @@
+"""Record printer responses and replay them without network access."""
+
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    IO,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Type,
+    Union,
+)
+
+from .htmlparsers import ENDPOINT_HTML_PARSERS, parse_html_page
+from .payloads import decode_json_payload
+from .transport import Response, Transport, TransportError
+
+
+class RecordedResponse(NamedTuple):
+    url: str
+    endpoint: str
+    # None if the printer did not respond
+    body: Optional[str]
+    # duration of the request in seconds
+    elapsed: float
+    timestamp: float
+
+
+class ResponseRecorder:
+    """
+    Append every response of a printer to a JSON lines corpus file.
+
+    The file is kept open and written through a buffer, so recording does not
+    block the event loop on every response. Responses are only guaranteed to
+    be in the file after ``flush`` or ``close``.
+    """
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 1 << 16) -> None:
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self._file: Optional[IO[str]] = None
+
+    def record(self, response: RecordedResponse) -> None:
+        if self._file is None:
+            self._file = self.path.open(
+                "a", buffering=self.buffer_size, encoding="utf-8"
+            )
+        self._file.write(json.dumps(response._asdict()) + "\n")
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Write out buffered responses and close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ResponseRecorder":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+def load_corpus(path: Union[str, Path]) -> List[RecordedResponse]:
+    """Load all responses of a corpus file."""
+    with Path(path).open(encoding="utf-8") as file:
+        return [RecordedResponse(**json.loads(line)) for line in file if line.strip()]
+
+
+class ReplaySession(Transport):
+    """
+    Serve a recorded corpus in place of the network.
+
+    Responses recorded several times for the same URL are replayed in
+    recording order, starting over after the last one.
+    URLs that are not part of the corpus fail like unreachable printers.
+    """
+
+    charset = "utf-8"
+
+    def __init__(self, responses: Iterable[RecordedResponse]) -> None:
+        recorded: Dict[str, List[Optional[str]]] = {}
+        for response in responses:
+            recorded.setdefault(f"{response.url}{response.endpoint}", []).append(
+                response.body
+            )
+        self._responses = {url: itertools.cycle(r) for url, r in recorded.items()}
+
+    async def get(self, url: str, max_size: int, keep_alive: bool = True) -> Response:
+        responses = self._responses.get(url)
+        body = None if responses is None else next(responses)
+        if body is None:
+            raise TransportError(f"No recorded response for {url}")
+        encoded = body.encode(self.charset)
+        if len(encoded) > max_size:
+            return Response(None, self.charset, len(encoded))
+        return Response(encoded, self.charset, len(encoded))
+
+
+class BenchmarkResult(NamedTuple):
+    responses: int
+    characters: int
+    seconds: float
+
+    @property
+    def responses_per_second(self) -> float:
+        return self.responses / self.seconds if self.seconds else float("inf")
+
+    @property
+    def characters_per_second(self) -> float:
+        return self.characters / self.seconds if self.seconds else float("inf")
+
+
+def benchmark_corpus(
+    responses: Iterable[RecordedResponse], repeat: int = 1
+) -> Dict[str, BenchmarkResult]:
+    """
+    Measure decoding (JSON endpoints) and parsing (HTML endpoints) of all
+    recorded responses, per endpoint.
+    """
+    bodies: Dict[str, List[str]] = {}
+    for response in responses:
+        if response.body is not None:
+            bodies.setdefault(response.endpoint, []).append(response.body)
+
+    results = {}
+    for endpoint, texts in bodies.items():
+        if endpoint in ENDPOINT_HTML_PARSERS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for text in texts:
+                    parse_html_page(endpoint, text, {})
+        elif endpoint.endswith(".json"):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for text in texts:
+                    decode_json_payload(text)
+        else:
+            continue
+        results[endpoint] = BenchmarkResult(
+            len(texts) * repeat,
+            sum(map(len, texts)) * repeat,
+            time.perf_counter() - start,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: {sys.argv[0]} CORPUS [REPEAT]", file=sys.stderr)
+        sys.exit(1)
+    corpus = load_corpus(sys.argv[1])
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 1
+    for endpoint, result in benchmark_corpus(corpus, repeat).items():
+        print(
+            f"{endpoint}: {result.responses_per_second:.1f} responses/s, "
+            f"{result.characters_per_second / 1e6:.2f} M chars/s"
+        )
@@ -0,0 +1,183 @@
+"""Discover SyncThru printers by scanning IP networks."""
+
+import asyncio
+import ipaddress
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Union
+
+import aiohttp
+
+from . import (
+    ENDPOINT_API_BASE,
+    PRINTER_ENDPOINT,
+    ConnectionMode,
+    SyncThru,
+)
+from .htmlparsers import ENDPOINT_HTML_HOME, HomeParser
+
+
+class DiscoveredPrinter(NamedTuple):
+    """A host that answered like a SyncThru web service."""
+
+    host: str
+    model: Optional[str]
+    serial_number: Optional[str]
+    connection_mode: ConnectionMode
+
+
+Address = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _is_range(net: Network) -> bool:
+    """/31 and /32 networks (/127 and /128 for IPv6) are explicit addresses."""
+    return net.num_addresses > 2
+
+
+def _nested(net: Network, other: Network) -> bool:
+    """Return true if ``net`` is a proper subnet of ``other``."""
+    return (
+        net != other
+        and net.version == other.version
+        and net.network_address in other
+        and net.broadcast_address in other
+    )
+
+
+def _in_hosts(address: Address, net: Network) -> bool:
+    """Return true if ``address`` is one of the ``hosts()`` of a range."""
+    if address.version != net.version or address not in net:
+        return False
+    if address == net.network_address:
+        return False
+    # only IPv4 networks exclude their broadcast address
+    return net.version == 6 or address != net.broadcast_address
+
+
+def _iter_hosts(networks: Iterable[str]) -> Iterator[str]:
+    """
+    Yield every host address of the given networks exactly once.
+
+    Ranges nested in another given range are skipped instead of remembering
+    the scanned addresses. Explicit addresses are scanned after the ranges,
+    unless they are among their hosts.
+    """
+    nets = [ipaddress.ip_network(network, strict=False) for network in networks]
+    # dict keeps the order of the given ranges
+    ranges = list(dict.fromkeys(net for net in nets if _is_range(net)))
+    for net in ranges:
+        if not any(_nested(net, other) for other in ranges):
+            yield from map(str, net.hosts())
+    explicit: Set[str] = set()
+    for net in nets:
+        if _is_range(net):
+            continue
+        for address in net:
+            host = str(address)
+            if host in explicit or any(_in_hosts(address, other) for other in ranges):
+                continue
+            explicit.add(host)
+            yield host
+
+
+async def _port_open(host: str, port: int, timeout: float) -> bool:
+    """Check with a plain TCP connect whether a host accepts connections."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def fingerprint(
+    host: str, session: aiohttp.ClientSession, race: bool = False
+) -> Optional[DiscoveredPrinter]:
+    """
+    Identify a SyncThru printer with as few requests as possible.
+
+    The JSON home endpoint is tried first, the HTML home page is only
+    requested if the JSON API is not available. With ``race`` both are
+    requested at the same time. Printers whose HTML page won the race before
+    the JSON API failed are reported with ``ConnectionMode.AUTO``.
+    """
+    printer = SyncThru(host, session)
+    if race:
+        detected = await printer._race_connection_modes()
+        if detected is None:
+            return None
+        details: Dict[str, Any] = detected.data.get("identity", {})
+        if detected.connection_mode == ConnectionMode.API:
+            return DiscoveredPrinter(
+                host,
+                details.get("model_name"),
+                details.get("serial_num"),
+                ConnectionMode.API,
+            )
+        return DiscoveredPrinter(
+            host,
+            details.get("model_name"),
+            None,
+            ConnectionMode.HTML if detected.api_unsupported else ConnectionMode.AUTO,
+        )
+    res_raw = await printer._get_endpoint(f"{ENDPOINT_API_BASE}{PRINTER_ENDPOINT}")
+    if res_raw is not None:
+        res = printer._decode_json_payload(res_raw)
+        if isinstance(res, dict):
+            identity: Dict[str, Any] = res.get("identity", {})
+            return DiscoveredPrinter(
+                host,
+                identity.get("model_name"),
+                identity.get("serial_num"),
+                ConnectionMode.API,
+            )
+
+    html_res = await printer._get_endpoint(ENDPOINT_HTML_HOME)
+    if html_res is not None:
+        data: Dict[str, Any] = {}
+        HomeParser(data).feed(html_res)
+        model = data["identity"].get("model_name")
+        if model:
+            return DiscoveredPrinter(host, model, None, ConnectionMode.HTML)
+    return None
+
+
+async def discover(
+    networks: Iterable[str],
+    session: aiohttp.ClientSession,
+    port: int = 80,
+    concurrency: int = 256,
+    connect_timeout: float = 0.5,
+    fingerprint_timeout: float = 5.0,
+    race: bool = False,
+) -> List[DiscoveredPrinter]:
+    """
+    Scan the given networks (in CIDR notation) for SyncThru printers.
+
+    Every host is first checked with a cheap TCP connect, only hosts with an
+    open port receive HTTP requests. At most ``concurrency`` hosts are
+    probed at the same time. With ``race``, hosts are fingerprinted by
+    requesting the JSON API and the HTML home page at the same time.
+    """
+    hosts = _iter_hosts(networks)
+    found: List[DiscoveredPrinter] = []
+
+    async def worker() -> None:
+        for host in hosts:
+            if not await _port_open(host, port, connect_timeout):
+                continue
+            address = f"[{host}]" if ":" in host else host
+            try:
+                printer = await asyncio.wait_for(
+                    fingerprint(f"{address}:{port}", session, race), fingerprint_timeout
+                )
+            except asyncio.TimeoutError:
+                continue
+            if printer is not None:
+                found.append(printer)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return found
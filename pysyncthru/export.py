@@ -0,0 +1,141 @@
+"""
+Columnar export of fleet data for analytics.
+
+Requires numpy, the Arrow export additionally requires pyarrow.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Sized, Tuple
+
+from . import SyncThru
+from .fleet import FleetSnapshot
+
+if TYPE_CHECKING:
+    import numpy
+    import pyarrow
+
+# (column name, numpy type), missing numeric values are stored as -1
+# strings are stored as objects, so that they are never truncated
+_STRING_COLUMNS = [("host", "O"), ("model", "O")]
+_NUMERIC_COLUMNS = [
+    ("state", "i1"),
+    *((f"{SyncThru.TONER}_{color}", "i2") for color in SyncThru.COLOR_NAMES),
+    *((f"{SyncThru.DRUM}_{color}", "i2") for color in SyncThru.COLOR_NAMES),
+    *((f"{SyncThru.TRAY}{i}_capacity", "i4") for i in range(1, 6)),
+    ("mp_capacity", "i4"),
+    ("manual_capacity", "i4"),
+    ("print_count", "i8"),
+    ("copy_count", "i8"),
+]
+COLUMNS: List[Tuple[str, str]] = [*_STRING_COLUMNS, *_NUMERIC_COLUMNS]
+
+_SUPPLIES = [
+    f"{supply}_{color}"
+    for supply in (SyncThru.TONER, SyncThru.DRUM)
+    for color in SyncThru.COLOR_NAMES
+]
+_TRAYS = [*(f"{SyncThru.TRAY}{i}" for i in range(1, 6)), "mp", "manual"]
+_COUNTERS = ["GXI_BILLING_PRINT_TOTAL_IMP_CNT", "GXI_BILLING_COPY_TOTAL_IMP_CNT"]
+
+Snapshot = Tuple[str, Dict[str, Any], Dict[str, Any]]
+# host, printer data and the values of the exported counters
+_Row = Tuple[str, Dict[str, Any], Tuple[Any, ...]]
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _import_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("numpy is required for the columnar export") from e
+    return numpy
+
+
+def _row(
+    host: str, printer_data: Dict[str, Any], counters: Tuple[Any, ...]
+) -> Tuple[Any, ...]:
+    identity = printer_data.get("identity") or {}
+    supplies = (printer_data.get(supply) or {} for supply in _SUPPLIES)
+    trays = (printer_data.get(tray) or {} for tray in _TRAYS)
+    return (
+        host,
+        identity.get("model_name") or "",
+        _int((printer_data.get("status") or {}).get("hrDeviceStatus")),
+        *(
+            _int(stat.get("remaining")) if stat.get("opt", 0) else -1
+            for stat in supplies
+        ),
+        *(_int(stat.get("capa")) if stat.get("opt", 0) == 1 else -1 for stat in trays),
+        *map(_int, counters),
+    )
+
+
+def _to_numpy(rows: Iterable[_Row], count: int = -1) -> "numpy.ndarray[Any, Any]":
+    np = _import_numpy()
+    array: "numpy.ndarray[Any, Any]" = np.fromiter(
+        (_row(*row) for row in rows), dtype=COLUMNS, count=count
+    )
+    return array
+
+
+def _count(items: Iterable[Any]) -> int:
+    """Number of rows to preallocate, -1 if unknown."""
+    return len(items) if isinstance(items, Sized) else -1
+
+
+def snapshots_to_numpy(snapshots: Iterable[Snapshot]) -> "numpy.ndarray[Any, Any]":
+    """
+    Return a structured array with one row per snapshot.
+    A snapshot is a tuple of host, printer data and counter data.
+    """
+    return _to_numpy(
+        (
+            (host, printer_data, _counters(counter_data))
+            for host, printer_data, counter_data in snapshots
+        ),
+        _count(snapshots),
+    )
+
+
+def _counters(counter_data: Mapping[str, Any]) -> Tuple[Any, ...]:
+    return tuple(counter_data.get(counter) for counter in _COUNTERS)
+
+
+def _printer_counters(printer: SyncThru) -> Tuple[Any, ...]:
+    # only the exported counters, the payload is not decoded as a whole
+    return (printer.print_count(), printer.copy_count())
+
+
+def fleet_to_numpy(printers: Iterable[SyncThru]) -> "numpy.ndarray[Any, Any]":
+    """Return a structured array with the current data of all printers."""
+    return _to_numpy(
+        ((p.url, p.data_printer_status, _printer_counters(p)) for p in printers),
+        _count(printers),
+    )
+
+
+def fleet_snapshots_to_numpy(
+    snapshots: Mapping[str, FleetSnapshot],
+) -> "numpy.ndarray[Any, Any]":
+    """Return a structured array from the snapshots of a fleet poller."""
+    return _to_numpy(
+        (
+            (host, s.data_printer_status, _counters(s.data_counter_status))
+            for host, s in snapshots.items()
+        ),
+        len(snapshots),
+    )
+
+
+def to_arrow(array: "numpy.ndarray[Any, Any]") -> "pyarrow.Table":
+    """Convert a structured array of the fleet to an Arrow table."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("pyarrow is required for the Arrow export") from e
+    return pyarrow.table({name: array[name] for name, _ in COLUMNS})
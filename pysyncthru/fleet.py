@@ -0,0 +1,224 @@
+"""Poll large fleets of SyncThru printers."""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+from multiprocessing.connection import Connection
+from types import TracebackType
+from typing import (
+    Any,
+    AsyncGenerator,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Type,
+)
+
+import aiohttp
+
+from . import ConnectionMode, SyncThru
+from .session import create_session
+
+DEFAULT_CONCURRENCY = 64
+
+
+class FleetSnapshot(NamedTuple):
+    """Data of one printer as retrieved by the last poll."""
+
+    data_printer_status: Dict[str, Any]
+    data_counter_status: Dict[str, Any]
+    # description of the error raised by the last update, if any
+    error: Optional[str]
+
+
+def snapshot(printer: SyncThru, error: Optional[BaseException] = None) -> FleetSnapshot:
+    """Return the cached data of a printer as snapshot."""
+    return FleetSnapshot(
+        printer.data_printer_status,
+        printer.data_counter_status,
+        None if error is None else repr(error),
+    )
+
+
+class PollResult(NamedTuple):
+    printer: SyncThru
+    # error raised by the update, None on success
+    error: Optional[Exception]
+
+
+async def poll_stream(
+    printers: Iterable[SyncThru],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    buffer_size: int = DEFAULT_CONCURRENCY,
+) -> AsyncGenerator[PollResult, None]:
+    """
+    Update printers and yield each one as soon as its update is done.
+
+    At most ``concurrency`` printers are updated at the same time and at most
+    ``buffer_size`` results wait for the consumer, so updates pause while the
+    consumer is busy. ``printers`` is consumed lazily and may be a generator.
+    """
+    queue: "asyncio.Queue[Optional[PollResult]]" = asyncio.Queue(buffer_size)
+    printer_iter = iter(printers)
+    errors: List[Exception] = []
+
+    async def worker() -> None:
+        try:
+            for printer in printer_iter:
+                try:
+                    await printer.update()
+                except Exception as e:
+                    await queue.put(PollResult(printer, e))
+                else:
+                    await queue.put(PollResult(printer, None))
+        except Exception as e:
+            # e.g. raised by the printers iterable
+            errors.append(e)
+        # signal that this worker is done
+        await queue.put(None)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+    running = len(workers)
+    try:
+        while running:
+            result = await queue.get()
+            if result is None:
+                running -= 1
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    if errors:
+        raise errors[0]
+
+
+async def _sweep(
+    printers: Dict[str, SyncThru], concurrency: int
+) -> Dict[str, FleetSnapshot]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update(printer: SyncThru) -> FleetSnapshot:
+        async with semaphore:
+            try:
+                await printer.update()
+            except Exception as e:
+                return snapshot(printer, e)
+            return snapshot(printer)
+
+    results = await asyncio.gather(*(update(p) for p in printers.values()))
+    return dict(zip(printers, results))
+
+
+def _shard_worker(
+    conn: Connection, hosts: List[str], connection_mode: int, concurrency: int
+) -> None:
+    """Poll a shard of the fleet in its own process on every request."""
+    loop = asyncio.new_event_loop()
+
+    async def open_session() -> aiohttp.ClientSession:
+        return create_session()
+
+    session = loop.run_until_complete(open_session())
+    printers = {
+        host: SyncThru(host, session, ConnectionMode(connection_mode)) for host in hosts
+    }
+    last: Dict[str, FleetSnapshot] = {}
+    try:
+        while conn.recv():
+            results = loop.run_until_complete(_sweep(printers, concurrency))
+            # only send back what changed since the last poll
+            delta = {
+                host: result
+                for host, result in results.items()
+                if last.get(host) != result
+            }
+            last.update(delta)
+            conn.send_bytes(pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL))
+    finally:
+        loop.run_until_complete(session.close())
+        loop.close()
+        conn.close()
+
+
+class ShardedFleetPoller:
+    """
+    Poll a fleet of printers with several worker processes.
+
+    The hosts are split into one shard per process. Each worker has its own
+    event loop and session, so decoding and parsing use all cores.
+    Workers only send back snapshots of printers whose data changed.
+    """
+
+    def __init__(
+        self,
+        hosts: Sequence[str],
+        processes: Optional[int] = None,
+        connection_mode: ConnectionMode = ConnectionMode.AUTO,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        start_method: str = "spawn",
+    ) -> None:
+        processes = min(processes or os.cpu_count() or 1, max(len(hosts), 1))
+        # the context types of the standard library lack Process
+        context: Any = multiprocessing.get_context(start_method)
+        self.snapshots: Dict[str, FleetSnapshot] = {}
+        self._connections: List[Connection] = []
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        for i in range(processes):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_shard_worker,
+                args=(
+                    child_conn,
+                    list(hosts[i::processes]),
+                    connection_mode.value,
+                    concurrency,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+
+    def poll(self) -> Dict[str, FleetSnapshot]:
+        """
+        Update all printers, blocking until every shard is done.
+        Returns the snapshots that changed, ``snapshots`` holds all of them.
+        """
+        for conn in self._connections:
+            conn.send(True)
+        changed: Dict[str, FleetSnapshot] = {}
+        for conn in self._connections:
+            changed.update(pickle.loads(conn.recv_bytes()))
+        self.snapshots.update(changed)
+        return changed
+
+    def close(self) -> None:
+        """Stop all worker processes."""
+        for conn in self._connections:
+            try:
+                conn.send(False)
+            except OSError:
+                pass
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._connections.clear()
+        self._processes.clear()
+
+    def __enter__(self) -> "ShardedFleetPoller":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
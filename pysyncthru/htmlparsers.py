@@ -1,6 +1,19 @@
 import re
+from enum import Enum
 from html.parser import HTMLParser
-from typing import Any, Callable, Dict, List, Tuple, Type
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    cast,
+)
 
 _VARIABLE_DICT: Dict[str, Callable[[str], Dict[str, Any]]] = {
     "BlackTonerPer": lambda x: {
@@ -39,119 +52,229 @@ class SyncThruParser(HTMLParser):
         self._data = data
 
 
-class HomeParser(SyncThruParser):
+class RuleAction(Enum):
+    # store the text of the element under the path
+    TEXT = 1
+    # use the text of the element as key for the following VALUE
+    LABEL = 2
+    # store the text of the element under the path and the last label
+    VALUE = 3
+    # complete a pending VALUE with an attribute of this element
+    ATTRIBUTE = 4
+    # discard a pending capture
+    RESET = 5
+    # parse javascript variable declarations inside this element
+    VARIABLES = 6
+
+
+class Rule(NamedTuple):
     """
-    Parser for the home.htm endpoint
+    Declarative extraction rule, matching a start tag by name and attributes
     """
 
-    def __init__(self, data: Dict[str, Any]):
-        super().__init__(data)
-        if "identity" not in data:
-            data["identity"] = {}
+    tag: str
+    action: RuleAction
+    # attributes the tag must have, a value of None matches any value
+    attrs: Tuple[Tuple[str, Optional[str]], ...] = ()
+    # attributes the tag must not have
+    without: Tuple[str, ...] = ()
+    path: Tuple[str, ...] = ()
+    # attribute read by ATTRIBUTE rules
+    attribute: str = "value"
+    # renames of normalized LABEL keys
+    aliases: Tuple[Tuple[str, str], ...] = ()
+    # only apply the rule to the first matching tag
+    once: bool = False
 
-    _first_lcdFont = True
-    _model_name = False
-    _name_tag = False
-    _name_key: str = ""
-    _value_tag = False
 
-    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Any]]) -> None:
-        if tag == "font" and ("class", "lcdFont") in attrs:
-            if self._first_lcdFont:
-                self._model_name = True
-                self._first_lcdFont = False
-            else:
-                self._name_tag = "color" not in map(lambda x: x[0], attrs)
-                self._value_tag = not self._name_tag
+def _normalize_label(text: str) -> str:
+    return text.replace(":", "").strip().replace(" ", "_").lower()
 
-    def handle_data(self, data: str) -> None:
-        if self._model_name:
-            self._data["identity"]["model_name"] = data.strip()
-            self._model_name = False
-        if self._name_tag:
-            data = data.replace(":", "").strip().replace(" ", "_").lower()
-            if data == "name":
-                data = "host_name"
-            self._name_key = data
-            # we assume that the whole tag is read at once
-            # (which is not necessarily true)
-            self._name_tag = False
-        if self._value_tag:
-            self._data["identity"][self._name_key] = data.strip()
-            # we assume that the whole tag is read at once
-            # (which is not necessarily true)
-            self._value_tag = False
-
-
-class VariableParser(SyncThruParser):
+
+def _matches(rule: Rule, attrs: List[Tuple[str, Any]]) -> bool:
+    for name, value in rule.attrs:
+        if value is None:
+            if all(attr != name for attr, _ in attrs):
+                return False
+        elif (name, value) not in attrs:
+            return False
+    return all(attr not in rule.without for attr, _ in attrs)
+
+
+class RuleParser(SyncThruParser):
     """
-    Generic parser for variables declared in javascript
+    Single pass parser applying a set of extraction rules.
+    Use compile_rules to create a parser for a specific set of rules.
     """
 
+    _rules: Dict[str, Tuple[Rule, ...]] = {}
+    _containers: Tuple[Tuple[str, ...], ...] = ()
+
     def __init__(self, data: Dict[str, Any]):
         super().__init__(data)
+        for path in self._containers:
+            self._container(path)
+        self._applied: Set[Rule] = set()
+        self._capture: Optional[Rule] = None
+        self._text: List[str] = []
+        self._label = ""
+        self._inside_script = False
+        self._script: List[str] = []
 
-    _inside_script = False
+    def _container(self, path: Tuple[str, ...]) -> Dict[str, Any]:
+        node = self._data
+        for key in path:
+            node = node.setdefault(key, {})
+        return node
 
     def handle_starttag(self, tag: str, attrs: List[Tuple[str, Any]]) -> None:
-        if tag == "script" and (
-            ("language", "javascript") in attrs or ("type", "text/javascript") in attrs
-        ):
-            self._inside_script = True
+        # text is collected until the next tag, so it may span several chunks
+        self._flush_text()
+        for rule in self._rules.get(tag, ()):
+            if rule.once and rule in self._applied:
+                continue
+            if _matches(rule, attrs):
+                if rule.once:
+                    self._applied.add(rule)
+                self._apply(rule, attrs)
+                return
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_text()
+        if tag == "script":
+            self._flush_script()
 
     def handle_data(self, data: str) -> None:
-        # parse javascript variable declarations
+        if self._capture is not None:
+            self._text.append(data)
         if self._inside_script:
-            for match in re.finditer(_VARIABLES_REG, data):
-                self._data.update(
-                    _VARIABLE_DICT[match.group("varname")](match.group("varval"))
-                )
+            self._script.append(data)
 
-    def handle_endtag(self, tag: str) -> None:
-        if tag == "script":
-            self._inside_script = False
+    def close(self) -> None:
+        super().close()
+        self._flush_text()
+        self._flush_script()
 
+    def _apply(self, rule: Rule, attrs: List[Tuple[str, Any]]) -> None:
+        if rule.action == RuleAction.VARIABLES:
+            self._inside_script = True
+        elif rule.action == RuleAction.RESET:
+            self._capture = None
+        elif rule.action == RuleAction.ATTRIBUTE:
+            if self._capture is not None and self._capture.action == RuleAction.VALUE:
+                value = dict(attrs).get(rule.attribute)
+                if value is not None:
+                    self._container(self._capture.path)[self._label] = value
+                    self._capture = None
+        else:
+            self._capture = rule
+
+    def _flush_text(self) -> None:
+        rule = self._capture
+        if rule is None or not self._text:
+            return
+        text = "".join(self._text)
+        self._text.clear()
+        self._capture = None
+        if rule.action == RuleAction.TEXT:
+            self._container(rule.path[:-1])[rule.path[-1]] = text.strip()
+        elif rule.action == RuleAction.LABEL:
+            key = _normalize_label(text)
+            self._label = dict(rule.aliases).get(key, key)
+        elif rule.action == RuleAction.VALUE:
+            self._container(rule.path)[self._label] = text.strip()
+
+    def _flush_script(self) -> None:
+        if not self._inside_script:
+            return
+        self._inside_script = False
+        script = "".join(self._script)
+        self._script.clear()
+        for match in re.finditer(_VARIABLES_REG, script):
+            self._data.update(
+                _VARIABLE_DICT[match.group("varname")](match.group("varval"))
+            )
 
-class GeneralProtocolParser(SyncThruParser):
+
+def compile_rules(name: str, rules: Sequence[Rule]) -> Type[RuleParser]:
     """
-    Parser for the general_protocols.htm website
+    Compile extraction rules into a parser class.
+    Rules are indexed by tag, for each tag the first matching rule applies.
     """
+    rules_by_tag: Dict[str, Tuple[Rule, ...]] = {}
+    containers: Dict[Tuple[str, ...], None] = {}
+    for rule in rules:
+        rules_by_tag[rule.tag] = (*rules_by_tag.get(rule.tag, ()), rule)
+        if rule.action == RuleAction.TEXT and len(rule.path) > 1:
+            containers[rule.path[:-1]] = None
+        elif rule.action == RuleAction.VALUE:
+            containers[rule.path] = None
+    return cast(
+        Type[RuleParser],
+        type(
+            name,
+            (RuleParser,),
+            {"_rules": rules_by_tag, "_containers": tuple(containers)},
+        ),
+    )
 
-    def __init__(self, data: Dict[str, Any]):
-        super().__init__(data)
-        if "identity" not in data:
-            data["identity"] = {}
 
-    _name_tag = False
-    _name_key: str = ""
-    _value_tag = False
+_LCD_FONT = (("class", "lcdFont"),)
 
-    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Any]]) -> None:
-        if tag == "td":
-            self._name_tag = ("class", "plainFont") in attrs
-            self._value_tag = ("class", "valueFont") in attrs
-        elif tag == "input" and self._value_tag and ("type", "text") in attrs:
-            self._data["identity"][self._name_key] = dict(attrs)["value"]
-            self._value_tag = False
+HOME_RULES: Tuple[Rule, ...] = (
+    # the first lcdFont holds the model name
+    Rule(
+        "font", RuleAction.TEXT, _LCD_FONT, path=("identity", "model_name"), once=True
+    ),
+    # afterwards names and (colored) values alternate
+    Rule(
+        "font",
+        RuleAction.LABEL,
+        _LCD_FONT,
+        without=("color",),
+        aliases=(("name", "host_name"),),
+    ),
+    Rule("font", RuleAction.VALUE, _LCD_FONT, path=("identity",)),
+)
 
-    def handle_data(self, data: str) -> None:
-        if self._name_tag:
-            data = data.replace(":", "").strip().replace(" ", "_").lower()
-            if data == "mac_address":
-                data = "mac_addr"
-            self._name_key = data
-            # we assume that the whole tag is read at once
-            # (which is not necessarily true)
-            self._name_tag = False
-        if self._value_tag:
-            self._data["identity"][self._name_key] = data.strip()
-            # we assume that the whole tag is read at once
-            # (which is not necessarily true)
-            self._value_tag = False
+VARIABLE_RULES: Tuple[Rule, ...] = (
+    Rule("script", RuleAction.VARIABLES, (("language", "javascript"),)),
+    Rule("script", RuleAction.VARIABLES, (("type", "text/javascript"),)),
+)
+
+GENERAL_PROTOCOL_RULES: Tuple[Rule, ...] = (
+    Rule(
+        "td",
+        RuleAction.LABEL,
+        (("class", "plainFont"),),
+        aliases=(("mac_address", "mac_addr"),),
+    ),
+    Rule("td", RuleAction.VALUE, (("class", "valueFont"),), path=("identity",)),
+    Rule("td", RuleAction.RESET),
+    Rule("input", RuleAction.ATTRIBUTE, (("type", "text"),)),
+)
 
+HomeParser = compile_rules("HomeParser", HOME_RULES)
+VariableParser = compile_rules("VariableParser", VARIABLE_RULES)
+GeneralProtocolParser = compile_rules("GeneralProtocolParser", GENERAL_PROTOCOL_RULES)
 
+ENDPOINT_HTML_RULES: Dict[str, Tuple[Rule, ...]] = {
+    ENDPOINT_HTML_HOME: HOME_RULES + VARIABLE_RULES,
+    ENDPOINT_HTML_SUPPLIES_STATUS: VARIABLE_RULES,
+    ENDPOINT_HTML_GENERAL_PROTOCOLS: GENERAL_PROTOCOL_RULES,
+}
+
+# One single pass parser per endpoint
 ENDPOINT_HTML_PARSERS: Dict[str, List[Type[SyncThruParser]]] = {
-    ENDPOINT_HTML_HOME: [HomeParser, VariableParser],
-    ENDPOINT_HTML_SUPPLIES_STATUS: [VariableParser],
-    ENDPOINT_HTML_GENERAL_PROTOCOLS: [GeneralProtocolParser],
+    endpoint: [compile_rules("EndpointParser", rules)]
+    for endpoint, rules in ENDPOINT_HTML_RULES.items()
 }
+
+
+def parse_html_page(endpoint: str, html: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Update the state dict with the data of an HTML page and return it."""
+    for parser_class in ENDPOINT_HTML_PARSERS[endpoint]:
+        parser = parser_class(data)
+        parser.feed(html)
+        parser.close()
+    return data
@@ -0,0 +1,104 @@
+"""Decoding of the (non-strict) JSON payloads returned by SyncThru."""
+
+import json
+import re
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple, cast
+
+import demjson3
+
+_LITERAL_REG = re.compile(r'"[^"]*(?:"|$)')
+# keys of a javascript object literal, quoted or not
+_KEY_REG = re.compile(r"[{,]\s*([\"']?)([A-Za-z_]\w*)\1\s*:")
+# values decoded by json and demjson3 alike
+_SCALAR_REG = re.compile(
+    r"\s*(?:-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)\s*"
+)
+
+
+def _escape_line_terminators(literal: "re.Match[str]") -> str:
+    return literal.group(0).replace("\r", "\\\r").replace("\n", "\\\n")
+
+
+def decode_json_payload(res_raw: str) -> Optional[Dict[str, Any]]:
+    """Decode a (non-strict) JSON payload as returned by SyncThru."""
+    try:
+        return cast(Dict[str, Any], demjson3.decode(res_raw))
+    except demjson3.JSONDecodeError as e:
+        error_msg = "Line terminator characters must be escaped inside string literals"
+        if error_msg in str(e):
+            # Escape \r and \n inside string literals in the raw payload.
+            new_res_raw = _LITERAL_REG.sub(_escape_line_terminators, res_raw)
+            try:
+                return cast(Dict[str, Any], demjson3.decode(new_res_raw))
+            except demjson3.JSONDecodeError:
+                return None
+        return None
+
+
+class LazyCounters(Mapping[str, Any]):
+    """
+    Read-only view of a flat counters payload.
+
+    The payload is indexed with a single scan, values are only decoded
+    when they are accessed. Only payloads that the full decoder accepts
+    as well are indexed, so both agree on every value.
+    """
+
+    def __init__(self, res_raw: str, offsets: Dict[str, Tuple[int, int]]) -> None:
+        self._raw = res_raw
+        self._offsets = offsets
+        self._values: Dict[str, Any] = {}
+        self._decoded: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_payload(cls, res_raw: str) -> Optional["LazyCounters"]:
+        """
+        Index the payload, returns None if it is not a flat object of
+        numbers and literals and needs to be decoded as a whole.
+        """
+        start = res_raw.find("{")
+        end = res_raw.rfind("}")
+        if (
+            start < 0
+            or end < start
+            or res_raw[:start].strip()
+            or res_raw[end + 1 :].strip()
+        ):
+            return None
+        offsets: Dict[str, Tuple[int, int]] = {}
+        matches = list(_KEY_REG.finditer(res_raw, start, end))
+        if not matches:
+            return None if res_raw[start + 1 : end].strip() else cls(res_raw, {})
+        if matches[0].start() != start:
+            return None
+        for match, following in zip(matches, [*matches[1:], None]):
+            value_end = end if following is None else following.start()
+            # strings may contain separators, anything else is invalid
+            if not _SCALAR_REG.fullmatch(res_raw, match.end(), value_end):
+                return None
+            offsets[match.group(2)] = (match.end(), value_end)
+        return cls(res_raw, offsets)
+
+    def __getitem__(self, key: str) -> Any:
+        if self._decoded is not None:
+            return self._decoded[key]
+        if key not in self._values:
+            start, end = self._offsets[key]
+            self._values[key] = json.loads(self._raw[start:end])
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._decoded is not None:
+            return iter(self._decoded)
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        if self._decoded is not None:
+            return len(self._decoded)
+        return len(self._offsets)
+
+    def decode_all(self) -> Dict[str, Any]:
+        """Decode the whole payload, invalid payloads result in an empty dict."""
+        if self._decoded is None:
+            self._decoded = decode_json_payload(self._raw) or {}
+        return self._decoded
@@ -0,0 +1,121 @@
+"""Learned HTML endpoint profiles shared by printers of the same model."""
+
+import time
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from .cache import DEFAULT_ENDPOINT_TTLS
+
+# Consecutive responses without data after which a page is skipped
+DEFAULT_MAX_MISSES = 3
+# Seconds after which a skipped page is requested again
+DEFAULT_RETRY_INTERVAL = 3600.0
+
+
+def page_has_data(page: Mapping[str, Any]) -> bool:
+    """Return true if a parsed page holds any value besides empty containers."""
+    return any(
+        page_has_data(value) if isinstance(value, dict) else True
+        for value in page.values()
+    )
+
+
+def merge_page(data: Dict[str, Any], page: Mapping[str, Any]) -> Dict[str, Any]:
+    """Merge a parsed page into the state dict and return it."""
+    for key, value in page.items():
+        if isinstance(value, dict):
+            target = data.get(key)
+            if not isinstance(target, dict):
+                target = data[key] = {}
+            # copied, so that reused pages are not changed by later merges
+            merge_page(target, value)
+        else:
+            data[key] = value
+    return data
+
+
+class EndpointProfile:
+    """HTML endpoints that printers of one model do or do not serve."""
+
+    def __init__(
+        self,
+        max_misses: int = DEFAULT_MAX_MISSES,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_misses = max_misses
+        self.retry_interval = retry_interval
+        self._clock = clock
+        # consecutive responses without data
+        self.misses: Dict[str, int] = {}
+        self._skipped_until: Dict[str, float] = {}
+
+    def serves(self, endpoint: str) -> bool:
+        """
+        Return false while an endpoint is skipped after repeatedly returning
+        no data. It is probed again after ``retry_interval`` seconds, e.g.
+        in case of a firmware update.
+        """
+        until = self._skipped_until.get(endpoint)
+        if until is None:
+            return True
+        if self._clock() < until:
+            return False
+        del self._skipped_until[endpoint]
+        return True
+
+    def record(self, endpoint: str, has_data: bool) -> None:
+        if has_data:
+            self.misses.pop(endpoint, None)
+            return
+        misses = self.misses.get(endpoint, 0) + 1
+        if misses >= self.max_misses:
+            self._skipped_until[endpoint] = self._clock() + self.retry_interval
+            misses = 0
+        self.misses[endpoint] = misses
+
+
+class ProfileRegistry:
+    """
+    Endpoint profiles by model name, usually shared by all printers.
+
+    Pages with an entry in ``endpoint_ttls``, by default the same as for the
+    response cache, are requested at most once per time to live by each
+    printer. Their last data is reused in between.
+    """
+
+    def __init__(
+        self,
+        max_misses: int = DEFAULT_MAX_MISSES,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL,
+        endpoint_ttls: Optional[Mapping[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_misses = max_misses
+        self.retry_interval = retry_interval
+        self.endpoint_ttls: Dict[str, float] = dict(
+            DEFAULT_ENDPOINT_TTLS if endpoint_ttls is None else endpoint_ttls
+        )
+        self.clock = clock
+        self._profiles: Dict[str, EndpointProfile] = {}
+
+    def profile(self, model: str) -> EndpointProfile:
+        profile = self._profiles.get(model)
+        if profile is None:
+            profile = self._profiles[model] = EndpointProfile(
+                self.max_misses, self.retry_interval, self.clock
+            )
+        return profile
+
+    def interval(self, endpoint: str) -> float:
+        """Seconds the data of a page is reused, 0 for pages never reused."""
+        return self.endpoint_ttls.get(endpoint, 0.0)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+
+# Lets printers of the same model learn from each other
+SHARED_PROFILES = ProfileRegistry()
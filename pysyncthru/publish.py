@@ -0,0 +1,337 @@
+"""Poll a fleet once and publish its state to many local subscribers."""
+
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Union,
+)
+
+from . import SyncThru
+from .fleet import DEFAULT_CONCURRENCY, FleetSnapshot, poll_stream, snapshot
+
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_INTERVAL = 60.0
+# pseudo fields for changes of the counters and of the update error
+COUNTERS_FIELD = "counters"
+ERROR_FIELD = "error"
+
+
+class Update(NamedTuple):
+    host: str
+    snapshot: FleetSnapshot
+    # top level fields of the printer data that changed since the last update
+    changed: FrozenSet[str]
+
+
+class QueuePolicy(Enum):
+    # discard the oldest queued update of a full queue
+    DROP_OLDEST = "drop_oldest"
+    # discard the new update if the queue is full
+    DROP_NEWEST = "drop_newest"
+    # keep only the newest update per printer, merging the changed fields
+    COALESCE = "coalesce"
+
+
+def changed_fields(
+    previous: Optional[FleetSnapshot], current: FleetSnapshot
+) -> FrozenSet[str]:
+    """Return the fields that differ between two snapshots of a printer."""
+    if previous is None:
+        return frozenset({*current.data_printer_status, COUNTERS_FIELD, ERROR_FIELD})
+    old, new = previous.data_printer_status, current.data_printer_status
+    changed: Set[str] = {
+        key for key in old.keys() | new.keys() if old.get(key) != new.get(key)
+    }
+    if previous.data_counter_status != current.data_counter_status:
+        changed.add(COUNTERS_FIELD)
+    if previous.error != current.error:
+        changed.add(ERROR_FIELD)
+    return frozenset(changed)
+
+
+def _string_set(
+    name: str, values: Optional[Collection[str]]
+) -> Optional[FrozenSet[str]]:
+    if values is None:
+        return None
+    if (
+        isinstance(values, (str, bytes))
+        or not isinstance(values, Collection)
+        or not all(isinstance(value, str) for value in values)
+    ):
+        raise TypeError(f"{name} must be a collection of strings")
+    return frozenset(values)
+
+
+class Subscription:
+    """
+    Bounded queue of updates for one subscriber.
+
+    Publishing never waits for subscribers, updates exceeding ``max_queue``
+    are handled according to ``policy`` and counted in ``dropped``.
+    Iterate the subscription to receive updates until it is closed.
+    Raises TypeError if ``hosts`` or ``fields`` are not collections of
+    strings.
+    """
+
+    def __init__(
+        self,
+        broadcaster: "Broadcaster",
+        hosts: Optional[Collection[str]] = None,
+        fields: Optional[Collection[str]] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        policy: QueuePolicy = QueuePolicy.COALESCE,
+    ) -> None:
+        self.hosts = _string_set("hosts", hosts)
+        self.fields = _string_set("fields", fields)
+        self._broadcaster = broadcaster
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        # keyed by host when coalescing, by a running number otherwise
+        self._queue: "OrderedDict[Union[str, int], Update]" = OrderedDict()
+        self._count = 0
+        self._ready = asyncio.Event()
+
+    def matches(self, update: Update) -> bool:
+        if self.hosts is not None and update.host not in self.hosts:
+            return False
+        return self.fields is None or not self.fields.isdisjoint(update.changed)
+
+    def offer(self, update: Update) -> None:
+        """Queue an update without waiting, applying the queue policy."""
+        if self.closed or not self.matches(update):
+            return
+        key: Union[str, int]
+        if self.policy == QueuePolicy.COALESCE:
+            key = update.host
+            pending = self._queue.get(key)
+            if pending is not None:
+                self._queue[key] = update._replace(
+                    changed=pending.changed | update.changed
+                )
+                self.dropped += 1
+                return
+        else:
+            key = self._count
+            self._count += 1
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.policy == QueuePolicy.DROP_NEWEST:
+                return
+            self._queue.popitem(last=False)
+        self._queue[key] = update
+        self._ready.set()
+
+    def get_nowait(self) -> Optional[Update]:
+        if not self._queue:
+            return None
+        update = self._queue.popitem(last=False)[1]
+        if not self._queue:
+            self._ready.clear()
+        return update
+
+    async def get(self) -> Optional[Update]:
+        """Wait for the next update, returns None once closed."""
+        while not self._queue and not self.closed:
+            await self._ready.wait()
+        return self.get_nowait()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Update:
+        update = await self.get()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._ready.set()
+        self._broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """Publish snapshots to all matching subscriptions."""
+
+    def __init__(self) -> None:
+        self.snapshots: Dict[str, FleetSnapshot] = {}
+        self._subscriptions: List[Subscription] = []
+
+    def subscribe(
+        self,
+        hosts: Optional[Collection[str]] = None,
+        fields: Optional[Collection[str]] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        policy: QueuePolicy = QueuePolicy.COALESCE,
+        initial: bool = True,
+    ) -> Subscription:
+        """
+        Subscribe to updates of ``hosts`` (all if None) that change any of
+        ``fields`` (any if None). With ``initial``, the current snapshots are
+        queued first.
+        """
+        subscription = Subscription(self, hosts, fields, max_queue, policy)
+        if initial:
+            for host, current in self.snapshots.items():
+                subscription.offer(Update(host, current, changed_fields(None, current)))
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, host: str, current: FleetSnapshot) -> Optional[Update]:
+        """Publish a snapshot, returns the update or None if nothing changed."""
+        changed = changed_fields(self.snapshots.get(host), current)
+        if not changed:
+            return None
+        self.snapshots[host] = current
+        update = Update(host, current, changed)
+        for subscription in self._subscriptions:
+            subscription.offer(update)
+        return update
+
+    def close(self) -> None:
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+
+def _request_list(request: Dict[str, Any], key: str) -> Optional[List[str]]:
+    value = request.get(key)
+    if value is not None and not isinstance(value, list):
+        raise TypeError(f"{key} must be a list")
+    return value
+
+
+def _encode_update(update: Update) -> bytes:
+    return (
+        json.dumps(
+            {
+                "host": update.host,
+                "changed": sorted(update.changed),
+                **update.snapshot._asdict(),
+            }
+        ).encode()
+        + b"\n"
+    )
+
+
+class PublishingDaemon:
+    """
+    Poll a fleet every ``interval`` seconds and publish the snapshots.
+
+    Subscribe in process through ``broadcaster`` or over a local socket
+    started with :meth:`serve`. Socket clients send one JSON line with the
+    optional keys ``hosts``, ``fields``, ``max_queue``, ``policy`` and
+    ``initial`` and then receive one JSON line per update.
+    """
+
+    def __init__(
+        self,
+        printers: Iterable[SyncThru],
+        interval: float = DEFAULT_INTERVAL,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        broadcaster: Optional[Broadcaster] = None,
+    ) -> None:
+        self.printers = list(printers)
+        self.interval = interval
+        self.concurrency = concurrency
+        self.broadcaster = broadcaster if broadcaster is not None else Broadcaster()
+
+    async def poll_once(self) -> int:
+        """Update all printers once, returns the number of published updates."""
+        published = 0
+        async for result in poll_stream(self.printers, self.concurrency):
+            printer = result.printer
+            update = self.broadcaster.publish(
+                printer.url, snapshot(printer, result.error)
+            )
+            published += update is not None
+        return published
+
+    async def run(self) -> None:
+        """Poll until cancelled."""
+        while True:
+            start = time.monotonic()
+            await self.poll_once()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - start)))
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await reader.readline()
+            request: Dict[str, Any] = json.loads(line) if line.strip() else {}
+            if not isinstance(request, dict):
+                raise TypeError("request must be a JSON object")
+            subscription = self.broadcaster.subscribe(
+                hosts=_request_list(request, "hosts"),
+                fields=_request_list(request, "fields"),
+                max_queue=int(request.get("max_queue", DEFAULT_MAX_QUEUE)),
+                policy=QueuePolicy(request.get("policy", QueuePolicy.COALESCE.value)),
+                initial=bool(request.get("initial", True)),
+            )
+        except (ValueError, TypeError) as e:
+            writer.write(json.dumps({"error": str(e)}).encode() + b"\n")
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+            return
+        try:
+            async for update in subscription:
+                writer.write(_encode_update(update))
+                # a slow client fills its bounded queue instead of the buffer
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            subscription.close()
+            writer.close()
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None
+    ) -> asyncio.Server:
+        """Serve subscriptions on a TCP port or, given a path, a Unix socket."""
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle_client, path)
+        return await asyncio.start_server(self._handle_client, host, port)
+
+
+async def _main(port: int, hosts: List[str]) -> None:
+    from .transport import StreamTransport
+
+    transport = StreamTransport()
+    daemon = PublishingDaemon([SyncThru(host, transport) for host in hosts])
+    server = await daemon.serve(port=port)
+    try:
+        await daemon.run()
+    finally:
+        server.close()
+        await transport.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} PORT HOST [HOST ...]", file=sys.stderr)
+        sys.exit(1)
+    asyncio.run(_main(int(sys.argv[1]), sys.argv[2:]))
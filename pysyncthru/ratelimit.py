@@ -0,0 +1,154 @@
+"""Token bucket rate limiting of requests to printers."""
+
+import asyncio
+import ipaddress
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+DEFAULT_SUBNET_PREFIX = 24
+
+
+class TokenBucket:
+    """
+    Token bucket refilled with ``rate`` tokens per second up to ``burst``.
+    Tokens may be taken beyond zero, later requests then wait for the debt.
+    Raises ValueError unless ``rate`` is positive.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float = 0.0) -> float:
+        """Seconds until more than ``amount`` tokens are available."""
+        self._refill()
+        missing = amount - self._tokens
+        return max(0.0, missing / self.rate) if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= amount
+
+
+class RateLimiterStatistics(NamedTuple):
+    requests: int
+    delayed_requests: int
+    # total time requests waited for the limits
+    delay: float
+
+
+def subnet_of(host: str, prefix: int = DEFAULT_SUBNET_PREFIX) -> str:
+    """Return the subnet of an IP address, other host names are their own site."""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return host
+    prefix = min(prefix, address.max_prefixlen)
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+class RateLimiter:
+    """
+    Limit requests and bytes per second globally, per site and per host.
+
+    Sites default to the /24 (IPv4) subnet of the printer, a different
+    mapping of hosts to sites can be passed as ``site_of``. Limits of None
+    are not enforced, other limits must be positive. Response sizes are only known afterwards, so the bytes
+    of a response delay the following requests.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        bytes_per_second: Optional[float] = None,
+        site_requests_per_second: Optional[float] = None,
+        site_bytes_per_second: Optional[float] = None,
+        host_requests_per_second: Optional[float] = None,
+        host_bytes_per_second: Optional[float] = None,
+        site_of: Callable[[str], str] = subnet_of,
+    ) -> None:
+        self._site_of = site_of
+        self._limits = {
+            "requests": (
+                requests_per_second,
+                site_requests_per_second,
+                host_requests_per_second,
+            ),
+            "bytes": (bytes_per_second, site_bytes_per_second, host_bytes_per_second),
+        }
+        for limits in self._limits.values():
+            for limit in limits:
+                if limit is not None and limit <= 0:
+                    raise ValueError(f"Limits must be positive, got {limit}")
+        # buckets by kind and (scope, key)
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {
+            "requests": {},
+            "bytes": {},
+        }
+        self._requests = 0
+        self._delayed_requests = 0
+        self._delay = 0.0
+
+    def _bucket_list(self, kind: str, host: str) -> List[TokenBucket]:
+        buckets = self._buckets[kind]
+        result = []
+        for rate, key in zip(
+            self._limits[kind], ("", f"site:{self._site_of(host)}", f"host:{host}")
+        ):
+            if rate is None:
+                continue
+            if key not in buckets:
+                buckets[key] = TokenBucket(rate)
+            result.append(buckets[key])
+        return result
+
+    async def acquire(self, host: str) -> float:
+        """Wait until a request to the host is allowed, returns the delay."""
+        request_buckets = self._bucket_list("requests", host)
+        byte_buckets = self._bucket_list("bytes", host)
+        waited = 0.0
+        while True:
+            delay = max(
+                (
+                    *(bucket.delay(1) for bucket in request_buckets),
+                    *(bucket.delay() for bucket in byte_buckets),
+                    0.0,
+                )
+            )
+            if delay <= 0:
+                break
+            start = time.monotonic()
+            await asyncio.sleep(delay)
+            waited += time.monotonic() - start
+        for bucket in request_buckets:
+            bucket.take(1)
+        self._requests += 1
+        if waited:
+            self._delayed_requests += 1
+            self._delay += waited
+        return waited
+
+    def consume_bytes(self, host: str, size: int) -> None:
+        """Account for the bytes of a response."""
+        for bucket in self._bucket_list("bytes", host):
+            bucket.take(size)
+
+    def statistics(self) -> RateLimiterStatistics:
+        return RateLimiterStatistics(
+            self._requests, self._delayed_requests, self._delay
+        )
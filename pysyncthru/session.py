@@ -0,0 +1,38 @@
+"""Managed aiohttp sessions tuned for the embedded SyncThru web servers."""
+
+import aiohttp
+
+from .transport import (
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_LIMIT_PER_HOST,
+    DEFAULT_TIMEOUT,
+)
+
+DEFAULT_DNS_CACHE_TTL = 300
+
+
+def create_session(
+    limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl: int = DEFAULT_DNS_CACHE_TTL,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> aiohttp.ClientSession:
+    """
+    Create a client session that reuses connections per printer.
+
+    Connections are kept alive for ``keepalive_timeout`` seconds and at most
+    ``limit_per_host`` connections are opened to the same printer.
+    Resolved host names are cached for ``dns_cache_ttl`` seconds.
+    Printers that break on reused connections are detected by
+    :class:`pysyncthru.SyncThru`, which then sends ``Connection: close``.
+    Must be called from within a running event loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=True,
+        ttl_dns_cache=dns_cache_ttl,
+    )
+    return aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+    )
@@ -0,0 +1,564 @@
+"""Minimal SNMPv2c client reading printer status from the Printer MIB."""
+
+import asyncio
+import itertools
+import re
+import socket
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+Oid = Tuple[int, ...]
+
+DEFAULT_PORT = 161
+DEFAULT_COMMUNITY = "public"
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRIES = 1
+DEFAULT_MAX_REPETITIONS = 8
+VERSION_2C = 1
+
+_INTEGER = 0x02
+_OCTET_STRING = 0x04
+_NULL = 0x05
+_OBJECT_IDENTIFIER = 0x06
+_SEQUENCE = 0x30
+_IP_ADDRESS = 0x40
+_COUNTER32 = 0x41
+_GAUGE32 = 0x42
+_TIMETICKS = 0x43
+_COUNTER64 = 0x46
+_UNSIGNED = (_COUNTER32, _GAUGE32, _TIMETICKS, _COUNTER64)
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+# error-status of responses
+NO_ERROR = 0
+TOO_BIG = 1
+
+
+class SpecialValue(NamedTuple):
+    """Exception value of a variable binding, e.g. endOfMibView."""
+
+    tag: int
+
+
+NO_SUCH_OBJECT = SpecialValue(0x80)
+NO_SUCH_INSTANCE = SpecialValue(0x81)
+END_OF_MIB_VIEW = SpecialValue(0x82)
+
+
+class SnmpError(Exception):
+    """Error raised when an agent responded with an error status."""
+
+
+class SnmpMessage(NamedTuple):
+    community: bytes
+    pdu_type: int
+    request_id: int
+    # non-repeaters and max-repetitions for GetBulkRequest
+    error_status: int
+    error_index: int
+    varbinds: List[Tuple[Oid, Any]]
+
+
+def parse_oid(text: str) -> Oid:
+    return tuple(int(part) for part in text.strip(".").split("."))
+
+
+def _tlv(tag: int, content: bytes) -> bytes:
+    length = len(content)
+    if length < 0x80:
+        return bytes((tag, length)) + content
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((tag, 0x80 | len(encoded))) + encoded + content
+
+
+def _encode_integer(value: int, tag: int = _INTEGER) -> bytes:
+    return _tlv(tag, value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True))
+
+
+def _encode_oid(oid: Oid) -> bytes:
+    content = bytearray([40 * oid[0] + oid[1]])
+    for sub_id in oid[2:]:
+        chunk = [sub_id & 0x7F]
+        sub_id >>= 7
+        while sub_id:
+            chunk.append(0x80 | (sub_id & 0x7F))
+            sub_id >>= 7
+        content.extend(reversed(chunk))
+    return _tlv(_OBJECT_IDENTIFIER, bytes(content))
+
+
+def _encode_value(value: Any) -> bytes:
+    if value is None:
+        return _tlv(_NULL, b"")
+    if isinstance(value, SpecialValue):
+        return _tlv(value.tag, b"")
+    if isinstance(value, int):
+        return _encode_integer(value)
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return _tlv(_OCTET_STRING, value)
+    if isinstance(value, tuple):
+        return _encode_oid(value)
+    raise TypeError(f"Cannot encode {value!r}")
+
+
+def encode_message(message: SnmpMessage) -> bytes:
+    varbinds = b"".join(
+        _tlv(_SEQUENCE, _encode_oid(oid) + _encode_value(value))
+        for oid, value in message.varbinds
+    )
+    pdu = _tlv(
+        message.pdu_type,
+        _encode_integer(message.request_id)
+        + _encode_integer(message.error_status)
+        + _encode_integer(message.error_index)
+        + _tlv(_SEQUENCE, varbinds),
+    )
+    return _tlv(
+        _SEQUENCE,
+        _encode_integer(VERSION_2C) + _tlv(_OCTET_STRING, message.community) + pdu,
+    )
+
+
+def _read_tlv(data: bytes, offset: int) -> Tuple[int, int, int]:
+    """Return tag, start and end of the content of the element at offset."""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(data[offset : offset + size], "big")
+            offset += size
+    except IndexError:
+        raise ValueError("Truncated SNMP message") from None
+    if offset + length > len(data):
+        raise ValueError("Truncated SNMP message")
+    return tag, offset, offset + length
+
+
+def _decode_oid(content: bytes) -> Oid:
+    if not content:
+        raise ValueError("Empty object identifier")
+    oid = list(divmod(content[0], 40)) if content[0] < 80 else [2, content[0] - 80]
+    sub_id = 0
+    for byte in content[1:]:
+        sub_id = (sub_id << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(sub_id)
+            sub_id = 0
+    return tuple(oid)
+
+
+def _decode_value(tag: int, content: bytes) -> Any:
+    if tag == _INTEGER:
+        return int.from_bytes(content, "big", signed=True)
+    if tag in _UNSIGNED:
+        return int.from_bytes(content, "big")
+    if tag == _OCTET_STRING:
+        return content
+    if tag == _NULL:
+        return None
+    if tag == _OBJECT_IDENTIFIER:
+        return _decode_oid(content)
+    if tag == _IP_ADDRESS:
+        return ".".join(map(str, content))
+    return SpecialValue(tag)
+
+
+def _read_integer(data: bytes, offset: int) -> Tuple[int, int]:
+    tag, start, end = _read_tlv(data, offset)
+    if tag != _INTEGER:
+        raise ValueError("Expected INTEGER")
+    return int.from_bytes(data[start:end], "big", signed=True), end
+
+
+def decode_message(data: bytes) -> SnmpMessage:
+    """Decode an SNMPv2c message, raises ValueError if it is malformed."""
+    tag, offset, _ = _read_tlv(data, 0)
+    if tag != _SEQUENCE:
+        raise ValueError("Expected SNMP message")
+    version, offset = _read_integer(data, offset)
+    if version != VERSION_2C:
+        raise ValueError(f"Unsupported SNMP version {version}")
+    tag, start, offset = _read_tlv(data, offset)
+    community = data[start:offset]
+    pdu_type, offset, _ = _read_tlv(data, offset)
+    request_id, offset = _read_integer(data, offset)
+    error_status, offset = _read_integer(data, offset)
+    error_index, offset = _read_integer(data, offset)
+    tag, offset, end = _read_tlv(data, offset)
+    varbinds = []
+    while offset < end:
+        _, start, offset = _read_tlv(data, offset)
+        tag, oid_start, oid_end = _read_tlv(data, start)
+        if tag != _OBJECT_IDENTIFIER:
+            raise ValueError("Expected OBJECT IDENTIFIER")
+        tag, value_start, value_end = _read_tlv(data, oid_end)
+        varbinds.append(
+            (
+                _decode_oid(data[oid_start:oid_end]),
+                _decode_value(tag, data[value_start:value_end]),
+            )
+        )
+    return SnmpMessage(
+        community, pdu_type, request_id, error_status, error_index, varbinds
+    )
+
+
+class _SnmpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending: Dict[int, Tuple[str, "asyncio.Future[Any]"]]) -> None:
+        self._pending = pending
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        try:
+            message = decode_message(data)
+        except ValueError:
+            return
+        pending = self._pending.get(message.request_id)
+        if pending is None or pending[0] != addr[0] or pending[1].done():
+            return
+        pending[1].set_result(message)
+
+
+class SnmpClient:
+    """
+    SNMPv2c client sending the requests to all hosts over one UDP socket.
+
+    Responses are matched to requests by their request id, so any number of
+    requests can be in flight at the same time. Only IPv4 is supported.
+    """
+
+    def __init__(
+        self,
+        community: str = DEFAULT_COMMUNITY,
+        port: int = DEFAULT_PORT,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+    ) -> None:
+        self.community = community.encode()
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._pending: Dict[int, Tuple[str, "asyncio.Future[Any]"]] = {}
+        self._request_ids = itertools.count(1)
+        self._addresses: Dict[str, str] = {}
+
+    async def __aenter__(self) -> "SnmpClient":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+    async def _resolve(self, host: str) -> str:
+        if host not in self._addresses:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, self.port, family=socket.AF_INET, type=socket.SOCK_DGRAM
+            )
+            self._addresses[host] = str(infos[0][4][0])
+        return self._addresses[host]
+
+    async def request(
+        self,
+        host: str,
+        pdu_type: int,
+        varbinds: Sequence[Tuple[Oid, Any]],
+        error_status: int = 0,
+        error_index: int = 0,
+    ) -> SnmpMessage:
+        """
+        Send a request, raises asyncio.TimeoutError if the host did not
+        respond after all retries and OSError if it cannot be reached.
+        """
+        address = await self._resolve(host)
+        if self._transport is None:
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _SnmpProtocol(self._pending),
+                local_addr=("0.0.0.0", 0),
+                family=socket.AF_INET,
+            )
+            # another request may have opened the socket in the meantime
+            if self._transport is None:
+                self._transport = transport
+            else:
+                transport.close()
+        request_id = next(self._request_ids) & 0x7FFFFFFF
+        packet = encode_message(
+            SnmpMessage(
+                self.community,
+                pdu_type,
+                request_id,
+                error_status,
+                error_index,
+                list(varbinds),
+            )
+        )
+        future: "asyncio.Future[SnmpMessage]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending[request_id] = (address, future)
+        try:
+            attempts = 0
+            while True:
+                self._transport.sendto(packet, (address, self.port))
+                attempts += 1
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                except asyncio.TimeoutError:
+                    if attempts > self.retries:
+                        raise
+        finally:
+            del self._pending[request_id]
+            future.cancel()
+
+    async def get(self, host: str, oids: Sequence[Oid]) -> List[Tuple[Oid, Any]]:
+        response = await self.request(host, GET_REQUEST, [(o, None) for o in oids])
+        return response.varbinds
+
+    async def get_bulk(
+        self,
+        host: str,
+        non_repeaters: Sequence[Oid],
+        repeaters: Sequence[Oid],
+        max_repetitions: int = DEFAULT_MAX_REPETITIONS,
+    ) -> List[Tuple[Oid, Any]]:
+        response = await self.request(
+            host,
+            GET_BULK_REQUEST,
+            [(oid, None) for oid in (*non_repeaters, *repeaters)],
+            len(non_repeaters),
+            max_repetitions,
+        )
+        return response.varbinds
+
+    async def bulk_walk(
+        self,
+        host: str,
+        non_repeaters: Sequence[Oid],
+        columns: Sequence[Oid],
+        max_repetitions: int = DEFAULT_MAX_REPETITIONS,
+    ) -> List[Tuple[Oid, Any]]:
+        """
+        Return the successors of ``non_repeaters`` in order, followed by all
+        rows of the table ``columns``. GetBulkRequests are repeated until
+        every column ended, with fewer repetitions if a response is too big.
+        Raises SnmpError if the agent responded with another error.
+        """
+        scalars = list(non_repeaters)
+        cursors = {column: column for column in columns}
+        result: List[Tuple[Oid, Any]] = []
+        while cursors or scalars:
+            pending = list(cursors)
+            response = await self.request(
+                host,
+                GET_BULK_REQUEST,
+                [(oid, None) for oid in (*scalars, *cursors.values())],
+                len(scalars),
+                max_repetitions,
+            )
+            if response.error_status == TOO_BIG and max_repetitions > 1:
+                max_repetitions //= 2
+                continue
+            if response.error_status != NO_ERROR:
+                raise SnmpError(
+                    f"{host} responded with error status {response.error_status}"
+                )
+            result.extend(response.varbinds[: len(scalars)])
+            rows = response.varbinds[len(scalars) :]
+            scalars = []
+            if not rows:
+                break
+            for i, (oid, value) in enumerate(rows):
+                column = pending[i % len(pending)]
+                if column not in cursors:
+                    continue
+                # the column ended, or the agent did not advance
+                if not _valid(oid, value, column) or oid <= cursors[column]:
+                    del cursors[column]
+                    continue
+                result.append((oid, value))
+                cursors[column] = oid
+        return result
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+# GetBulkRequest returns the successors of the requested OIDs, so objects
+# are requested without instance and tables without index
+SYS_CONTACT = parse_oid("1.3.6.1.2.1.1.4")
+SYS_NAME = parse_oid("1.3.6.1.2.1.1.5")
+SYS_LOCATION = parse_oid("1.3.6.1.2.1.1.6")
+HR_DEVICE_DESCR = parse_oid("1.3.6.1.2.1.25.3.2.1.3")
+HR_DEVICE_STATUS = parse_oid("1.3.6.1.2.1.25.3.2.1.5")
+PRT_GENERAL_SERIAL_NUMBER = parse_oid("1.3.6.1.2.1.43.5.1.1.17")
+PRT_MARKER_LIFE_COUNT = parse_oid("1.3.6.1.2.1.43.10.2.1.4")
+SCALAR_OIDS = [
+    SYS_CONTACT,
+    SYS_NAME,
+    SYS_LOCATION,
+    HR_DEVICE_DESCR,
+    HR_DEVICE_STATUS,
+    PRT_GENERAL_SERIAL_NUMBER,
+    PRT_MARKER_LIFE_COUNT,
+]
+
+PRT_CONSOLE_DISPLAY_BUFFER_TEXT = parse_oid("1.3.6.1.2.1.43.16.5.1.2")
+PRT_INPUT_MAX_CAPACITY = parse_oid("1.3.6.1.2.1.43.8.2.1.9")
+PRT_INPUT_CURRENT_LEVEL = parse_oid("1.3.6.1.2.1.43.8.2.1.10")
+PRT_INPUT_NAME = parse_oid("1.3.6.1.2.1.43.8.2.1.13")
+PRT_MARKER_SUPPLIES_TYPE = parse_oid("1.3.6.1.2.1.43.11.1.1.5")
+PRT_MARKER_SUPPLIES_DESCRIPTION = parse_oid("1.3.6.1.2.1.43.11.1.1.6")
+PRT_MARKER_SUPPLIES_MAX_CAPACITY = parse_oid("1.3.6.1.2.1.43.11.1.1.8")
+PRT_MARKER_SUPPLIES_LEVEL = parse_oid("1.3.6.1.2.1.43.11.1.1.9")
+TABLE_OIDS = [
+    PRT_CONSOLE_DISPLAY_BUFFER_TEXT,
+    PRT_INPUT_MAX_CAPACITY,
+    PRT_INPUT_CURRENT_LEVEL,
+    PRT_INPUT_NAME,
+    PRT_MARKER_SUPPLIES_TYPE,
+    PRT_MARKER_SUPPLIES_DESCRIPTION,
+    PRT_MARKER_SUPPLIES_MAX_CAPACITY,
+    PRT_MARKER_SUPPLIES_LEVEL,
+]
+
+# prtMarkerSuppliesType
+SUPPLY_TONER = 3
+SUPPLY_OPC = 9
+COLOR_NAMES = ["black", "cyan", "magenta", "yellow"]
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return "" if value is None or isinstance(value, SpecialValue) else str(value)
+
+
+def _valid(oid: Oid, value: Any, prefix: Oid) -> bool:
+    return oid[: len(prefix)] == prefix and not isinstance(value, SpecialValue)
+
+
+def _column(varbinds: Sequence[Tuple[Oid, Any]], column: Oid) -> Dict[Oid, Any]:
+    """Return the rows of a table column by their index."""
+    return {
+        oid[len(column) :]: value
+        for oid, value in varbinds
+        if _valid(oid, value, column)
+    }
+
+
+def _tray_key(name: str, index: int) -> str:
+    lower = name.lower()
+    if "manual" in lower:
+        return "manual"
+    if "mp" in lower.split() or "multi" in lower:
+        return "mp"
+    match = re.search(r"\d", lower)
+    return f"tray{match.group() if match else index}"
+
+
+def snmp_to_syncthru(
+    varbinds: Sequence[Tuple[Oid, Any]],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Map the successors of SCALAR_OIDS followed by the rows of TABLE_OIDS to
+    printer data and counters as of SyncThru.
+    """
+    scalars = {
+        prefix: value
+        for prefix, (oid, value) in zip(SCALAR_OIDS, varbinds)
+        if _valid(oid, value, prefix)
+    }
+    status = scalars.get(HR_DEVICE_STATUS)
+    lines = [
+        value
+        for _, value in sorted(
+            _column(varbinds, PRT_CONSOLE_DISPLAY_BUFFER_TEXT).items()
+        )
+    ]
+    data: Dict[str, Any] = {
+        "status": {
+            # unknown, but the printer answered
+            "hrDeviceStatus": status if isinstance(status, int) else 1,
+            **{
+                f"status{i}": _text(lines[i - 1] if i <= len(lines) else None)
+                for i in range(1, 5)
+            },
+        },
+        "identity": {
+            "model_name": _text(scalars.get(HR_DEVICE_DESCR)),
+            "host_name": _text(scalars.get(SYS_NAME)),
+            "location": _text(scalars.get(SYS_LOCATION)),
+            "contact": _text(scalars.get(SYS_CONTACT)),
+            "serial_num": _text(scalars.get(PRT_GENERAL_SERIAL_NUMBER)),
+        },
+    }
+
+    types = _column(varbinds, PRT_MARKER_SUPPLIES_TYPE)
+    descriptions = _column(varbinds, PRT_MARKER_SUPPLIES_DESCRIPTION)
+    maxima = _column(varbinds, PRT_MARKER_SUPPLIES_MAX_CAPACITY)
+    levels = _column(varbinds, PRT_MARKER_SUPPLIES_LEVEL)
+    for index, supply_type in types.items():
+        description = _text(descriptions.get(index)).lower()
+        if supply_type == SUPPLY_TONER:
+            kind = "toner"
+        elif supply_type == SUPPLY_OPC or "drum" in description:
+            kind = "drum"
+        else:
+            continue
+        color = next((c for c in COLOR_NAMES if c in description), "black")
+        maximum, level = maxima.get(index, -1), levels.get(index, -1)
+        data[f"{kind}_{color}"] = {
+            "opt": 1,
+            # None for unknown levels (-2), levels only known to be above
+            # zero (-3) and unknown capacities, instead of an empty supply
+            "remaining": level * 100 // maximum if level >= 0 and maximum > 0 else None,
+            "newError": "",
+        }
+
+    names = _column(varbinds, PRT_INPUT_NAME)
+    capacities = _column(varbinds, PRT_INPUT_MAX_CAPACITY)
+    tray_levels = _column(varbinds, PRT_INPUT_CURRENT_LEVEL)
+    for index in sorted(set(names) | set(capacities)):
+        data[_tray_key(_text(names.get(index)), index[-1])] = {
+            "opt": 1,
+            "capa": max(capacities.get(index, 0), 0),
+            "level": tray_levels.get(index, -1),
+            "newError": "",
+        }
+
+    counters = {}
+    life_count = scalars.get(PRT_MARKER_LIFE_COUNT)
+    if isinstance(life_count, int):
+        # all impressions of the marker, including copies
+        counters["GXI_BILLING_PRINT_TOTAL_IMP_CNT"] = life_count
+    return data, counters
+
+
+async def fetch_printer(
+    client: SnmpClient,
+    host: str,
+    max_repetitions: int = DEFAULT_MAX_REPETITIONS,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Retrieve printer data and counters with as few GetBulkRequests as the
+    tables allow, raises asyncio.TimeoutError or OSError if the printer cannot
+    be reached and SnmpError if it responded with an error.
+    """
+    varbinds = await client.bulk_walk(host, SCALAR_OIDS, TABLE_OIDS, max_repetitions)
+    return snmp_to_syncthru(varbinds)
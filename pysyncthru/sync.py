@@ -0,0 +1,111 @@
+"""Blocking interface to SyncThru for code without an event loop."""
+
+import asyncio
+import threading
+from types import TracebackType
+from typing import Any, Coroutine, Iterable, List, Optional, Type, TypeVar
+
+import aiohttp
+
+from . import ConnectionMode, SyncThru
+from .session import create_session
+from .transport import DEFAULT_LIMIT_PER_HOST, DEFAULT_TIMEOUT
+
+_T = TypeVar("_T")
+
+
+class SyncThruClient:
+    """
+    Thread-safe blocking client.
+
+    All printers share one session that lives on a persistent event loop in a
+    background thread, so connections are reused across calls.
+    The accessors of the returned SyncThru objects (``toner_status`` etc.)
+    can be called from any thread.
+    """
+
+    def __init__(
+        self,
+        limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="pysyncthru", daemon=True
+        )
+        self._thread.start()
+        self._session = self._run(self._create_session(limit_per_host, timeout))
+
+    @staticmethod
+    async def _create_session(
+        limit_per_host: int, timeout: float
+    ) -> aiohttp.ClientSession:
+        return create_session(limit_per_host=limit_per_host, timeout=timeout)
+
+    def _run(self, coro: Coroutine[Any, Any, _T]) -> _T:
+        if self._loop.is_closed():
+            coro.close()
+            raise RuntimeError("SyncThruClient is closed")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def printer(
+        self,
+        ip: str,
+        connection_mode: ConnectionMode = ConnectionMode.AUTO,
+        **kwargs: Any,
+    ) -> SyncThru:
+        """Create a printer that uses the shared session, without updating it."""
+        return SyncThru(ip, self._session, connection_mode, **kwargs)
+
+    def fetch(
+        self,
+        ip: str,
+        connection_mode: ConnectionMode = ConnectionMode.AUTO,
+        **kwargs: Any,
+    ) -> SyncThru:
+        """Create a printer and retrieve its data."""
+        printer = self.printer(ip, connection_mode, **kwargs)
+        self.update(printer)
+        return printer
+
+    def update(self, printer: SyncThru) -> None:
+        """Retrieve and cache the data of a printer, blocking until done."""
+        self._run(printer.update())
+
+    def update_all(self, printers: Iterable[SyncThru]) -> List[Optional[BaseException]]:
+        """
+        Update all printers concurrently, blocking until all are done.
+        Returns the error raised for each printer or None on success.
+        May be called from several threads at the same time.
+        """
+
+        async def update_all() -> List[Optional[BaseException]]:
+            results = await asyncio.gather(
+                *(printer.update() for printer in printers), return_exceptions=True
+            )
+            return [
+                result if isinstance(result, BaseException) else None
+                for result in results
+            ]
+
+        return self._run(update_all())
+
+    def close(self) -> None:
+        """Close the session and stop the background event loop."""
+        if self._loop.is_closed():
+            return
+        self._run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "SyncThruClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
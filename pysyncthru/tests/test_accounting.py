@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pysyncthru.accounting import AccountingEngine, CounterDelta
+
+PRINT = "GXI_BILLING_PRINT_TOTAL_IMP_CNT"
+COPY = "GXI_BILLING_COPY_TOTAL_IMP_CNT"
+HIERARCHY = {"a": ("berlin", "finance"), "b": ("berlin", "sales")}
+
+
+class AccountingEngineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = AccountingEngine(HIERARCHY.__getitem__)
+        self.engine.record("a", {PRINT: 100, COPY: 10, "other": 5}, "S1")
+        self.engine.record("b", {PRINT: 50, COPY: 0}, "S2")
+
+    def test_rollups(self) -> None:
+        self.assertEqual(
+            self.engine.record("a", {PRINT: 120, COPY: 10}, "S1"),
+            [CounterDelta("a", PRINT, 20, False)],
+        )
+        self.engine.record("b", {PRINT: 55, COPY: 3}, "S2")
+        self.assertEqual(self.engine.total(PRINT), 25)
+        self.assertEqual(self.engine.total(PRINT, ("berlin",)), 25)
+        self.assertEqual(self.engine.total(PRINT, ("berlin", "finance")), 20)
+        self.assertEqual(
+            self.engine.totals(("berlin", "sales", "b")), {PRINT: 5, COPY: 3}
+        )
+        self.assertEqual(self.engine.total("other"), 0)
+
+    def test_reset_and_swap(self) -> None:
+        self.assertEqual(
+            self.engine.record("a", {PRINT: 7, COPY: 10}, "S1"),
+            [CounterDelta("a", PRINT, 7, True)],
+        )
+        # a swapped printer only provides the new baseline
+        self.assertEqual(self.engine.record("a", {PRINT: 9000, COPY: 0}, "S3"), [])
+        self.engine.record("a", {PRINT: 9010, COPY: 0}, "S3")
+        self.assertEqual(self.engine.total(PRINT, ("berlin", "finance")), 17)
+        # offline printers have no counters
+        self.assertEqual(self.engine.record("a", {}, None), [])
+
+    def test_close_period(self) -> None:
+        self.engine.record("a", {PRINT: 101, COPY: 10}, "S1")
+        self.assertEqual(self.engine.close_period()[()], {PRINT: 1})
+        self.assertEqual(self.engine.total(PRINT), 0)
+        self.engine.record("a", {PRINT: 103, COPY: 10}, "S1")
+        self.assertEqual(self.engine.total(PRINT), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import unittest
+from typing import Any
+
+from pysyncthru import SyncthruState
+from pysyncthru.alerts import (
+    AlertEngine,
+    AlertEvent,
+    AlertRule,
+    device_error_rule,
+    toner_low_rule,
+)
+from .web_raw.web_state import RAW_STATE1
+
+
+def with_toner(remaining: int) -> dict[str, Any]:
+    data = copy.deepcopy(RAW_STATE1)
+    data["toner_black"]["remaining"] = remaining
+    return data
+
+
+class AlertEngineTest(unittest.TestCase):
+    def test_hysteresis(self) -> None:
+        engine = AlertEngine()
+        self.assertEqual(engine.evaluate("a", with_toner(58)), [])
+        self.assertEqual(
+            engine.evaluate("a", with_toner(8)),
+            [AlertEvent("a", "toner_black_low", True)],
+        )
+        # deduplicated while active, not cleared below the clear threshold
+        self.assertEqual(engine.evaluate("a", with_toner(7)), [])
+        self.assertEqual(engine.evaluate("a", with_toner(12)), [])
+        self.assertEqual(engine.active_alerts("a"), {"toner_black_low"})
+        self.assertEqual(
+            engine.evaluate("a", with_toner(100)),
+            [AlertEvent("a", "toner_black_low", False)],
+        )
+        self.assertEqual(engine.active_alerts("a"), set())
+
+    def test_device_error(self) -> None:
+        engine = AlertEngine()
+        data = copy.deepcopy(RAW_STATE1)
+        data["status"]["hrDeviceStatus"] = 5
+        self.assertEqual(
+            engine.evaluate("a", data), [AlertEvent("a", "device_error", True)]
+        )
+
+    def test_offline(self) -> None:
+        engine = AlertEngine()
+        offline = {"status": {"hrDeviceStatus": SyncthruState.OFFLINE.value}}
+        self.assertEqual(
+            engine.evaluate("a", with_toner(5)),
+            [AlertEvent("a", "toner_black_low", True)],
+        )
+        # missing values and offline printers keep the alerts
+        self.assertEqual(engine.evaluate("a", offline), [])
+        self.assertEqual(engine.active_alerts("a"), {"toner_black_low"})
+        self.assertEqual(engine.evaluate("a", with_toner(5)), [])
+        self.assertEqual(engine.evaluate("a", offline), [])
+        self.assertEqual(
+            engine.evaluate("a", with_toner(20)),
+            [AlertEvent("a", "toner_black_low", False)],
+        )
+
+    def test_manual_tray(self) -> None:
+        engine = AlertEngine()
+        data = copy.deepcopy(RAW_STATE1)
+        engine.evaluate("a", data)
+        data = copy.deepcopy(data)
+        data["mp"]["opt"] = 1
+        data["mp"]["newError"] = "3"
+        self.assertEqual(
+            engine.evaluate("a", data), [AlertEvent("a", "mp_error", True)]
+        )
+
+    def test_only_changed_fields_evaluated(self) -> None:
+        calls = []
+
+        def low(opt: Any, remaining: Any) -> bool:
+            calls.append(remaining)
+            return False
+
+        engine = AlertEngine(
+            [
+                AlertRule(
+                    "toner", [("toner_black", "opt"), ("toner_black", "remaining")], low
+                ),
+                AlertRule("error", [("status", "hrDeviceStatus")], lambda s: False),
+            ]
+        )
+        data = copy.deepcopy(RAW_STATE1)
+        engine.evaluate("a", data)
+        # the same snapshot is skipped entirely
+        engine.evaluate("a", data)
+        self.assertEqual(calls, [58])
+        data = copy.deepcopy(data)
+        data["status"]["hrDeviceStatus"] = 3
+        engine.evaluate("a", data)
+        self.assertEqual(calls, [58])
+        engine.evaluate("a", with_toner(40))
+        self.assertEqual(calls, [58, 40])
+
+    def test_unchanged_records_skipped(self) -> None:
+        looked_up = []
+
+        class Record(dict):  # type: ignore[type-arg]
+            def __getitem__(self, key: Any) -> Any:
+                looked_up.append(key)
+                return super().__getitem__(key)
+
+        engine = AlertEngine([toner_low_rule("black"), device_error_rule()])
+        data = {
+            "toner_black": Record(opt=1, remaining=5),
+            "status": Record(hrDeviceStatus=2),
+        }
+        self.assertEqual(len(engine.evaluate("a", data)), 1)
+        looked_up.clear()
+        # a new snapshot sharing the unchanged records, e.g. when compacted
+        data = {**data, "status": Record(hrDeviceStatus=5)}
+        self.assertEqual(
+            engine.evaluate("a", data), [AlertEvent("a", "device_error", True)]
+        )
+        self.assertEqual(looked_up, ["hrDeviceStatus"])
+        self.assertEqual(engine.active_alerts("a"), {"toner_black_low", "device_error"})
+
+
+if __name__ == "__main__":
+    unittest.main()
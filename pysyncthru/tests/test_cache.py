@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru, SyncthruState
+from pysyncthru.cache import CacheStatistics, ResponseCache
+from pysyncthru.htmlparsers import ENDPOINT_HTML_GENERAL_PROTOCOLS, ENDPOINT_HTML_HOME
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+
+
+class ResponseCacheTest(unittest.TestCase):
+    now = 0.0
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.cache = ResponseCache(
+            max_entries=2,
+            default_ttl=5,
+            endpoint_ttls={ENDPOINT_HTML_GENERAL_PROTOCOLS: 100},
+            clock=lambda: self.now,
+        )
+
+    def test_ttl(self) -> None:
+        self.cache.put("http://a", ENDPOINT_HTML_HOME, "home")
+        self.cache.put("http://a", ENDPOINT_HTML_GENERAL_PROTOCOLS, "protocols")
+        self.now = 10
+        self.assertIsNone(self.cache.get("http://a", ENDPOINT_HTML_HOME))
+        self.assertEqual(
+            self.cache.get("http://a", ENDPOINT_HTML_GENERAL_PROTOCOLS), "protocols"
+        )
+        self.assertEqual(self.cache.statistics(), CacheStatistics(1, 1, 0, 1))
+
+    def test_lru_eviction(self) -> None:
+        self.cache.put("http://a", ENDPOINT_HTML_HOME, "a")
+        self.cache.put("http://b", ENDPOINT_HTML_HOME, "b")
+        self.cache.get("http://a", ENDPOINT_HTML_HOME)
+        self.cache.put("http://c", ENDPOINT_HTML_HOME, "c")
+        self.assertIsNone(self.cache.get("http://b", ENDPOINT_HTML_HOME))
+        self.assertEqual(self.cache.get("http://a", ENDPOINT_HTML_HOME), "a")
+        self.assertEqual(self.cache.get("http://c", ENDPOINT_HTML_HOME), "c")
+        self.assertEqual(self.cache.statistics(), CacheStatistics(3, 1, 1, 2))
+
+
+class SharedCacheTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def test_instances_share_responses(self) -> None:
+        cache = ResponseCache()
+
+        async def fetch() -> None:
+            async with aiohttp.ClientSession() as session:
+                for _ in range(3):
+                    syncthru = SyncThru(
+                        self.url, session, ConnectionMode.API, cache=cache
+                    )
+                    await syncthru.update()
+                    self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+
+        asyncio.new_event_loop().run_until_complete(fetch())
+        self.assertEqual(self.server.request_count, 2)
+        self.assertEqual(cache.statistics(), CacheStatistics(4, 2, 0, 2))
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import unittest
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru
+from pysyncthru.compact import SnapshotCompactor, benchmark_memory
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_STATE1
+
+
+class SnapshotCompactorTest(unittest.TestCase):
+    def test_compact(self) -> None:
+        compactor = SnapshotCompactor()
+        first = compactor.compact(json.loads(json.dumps(RAW_STATE1)))
+        second = compactor.compact(json.loads(json.dumps(RAW_STATE1)))
+        self.assertEqual(first, RAW_STATE1)
+        self.assertEqual(second, RAW_STATE1)
+        # records are shared within and between snapshots
+        self.assertIs(first["tray3"], first["mp"])
+        self.assertIs(first["toner_cyan"], second["toner_cyan"])
+        self.assertIs(first["identity"], second["identity"])
+        self.assertIsNot(first, second)
+        self.assertIs(next(iter(first["identity"])), next(iter(second["identity"])))
+
+    def test_distinguishes_types(self) -> None:
+        compactor = SnapshotCompactor()
+        self.assertIs(compactor.compact({"opt": 1})["opt"], 1)
+        self.assertIs(compactor.compact({"opt": True})["opt"], True)
+
+    def test_bounded(self) -> None:
+        compactor = SnapshotCompactor(max_entries=2)
+        for i in range(5):
+            self.assertEqual(compactor.compact({"i": i}), {"i": i})
+        self.assertEqual(len(compactor), 2)
+
+    def test_least_recently_used(self) -> None:
+        compactor = SnapshotCompactor(max_entries=2)
+        stable = compactor.compact({"name": "tray"})
+        for count in range(5):
+            # a record changing every poll does not displace the stable one
+            compactor.compact({"cnt": count})
+            self.assertIs(compactor.compact({"name": "tray"}), stable)
+        self.assertEqual(len(compactor), 2)
+
+    def test_benchmark(self) -> None:
+        plain, compacted = benchmark_memory([json.dumps(RAW_STATE1)], copies=20)
+        self.assertLess(compacted, plain)
+
+
+class SyncThruCompactorTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def test_shared_compactor(self) -> None:
+        compactor = SnapshotCompactor()
+
+        async def fetch() -> list[SyncThru]:
+            async with aiohttp.ClientSession() as session:
+                printers = [
+                    SyncThru(self.url, session, ConnectionMode.API, compactor=compactor)
+                    for _ in range(2)
+                ]
+                for printer in printers:
+                    await printer.update()
+                return printers
+
+        first, second = asyncio.new_event_loop().run_until_complete(fetch())
+        self.assertEqual(first.raw(), RAW_STATE1)
+        self.assertIs(first.raw()["toner_black"], second.raw()["toner_black"])
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru
+from pysyncthru.corpus import (
+    ReplaySession,
+    ResponseRecorder,
+    benchmark_corpus,
+    load_corpus,
+)
+from pysyncthru.htmlparsers import ENDPOINT_HTML_PARSERS
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_COUNTER, RAW_HTML, RAW_STATE1
+
+
+class CorpusTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.corpus = Path(self.tmp_dir.name) / "corpus.jsonl"
+
+    def record(self) -> None:
+        async def fetch() -> None:
+            with ResponseRecorder(self.corpus) as recorder:
+                async with aiohttp.ClientSession() as session:
+                    for mode in (ConnectionMode.API, ConnectionMode.HTML):
+                        syncthru = SyncThru(self.url, session, mode, recorder=recorder)
+                        await syncthru.update()
+
+        asyncio.new_event_loop().run_until_complete(fetch())
+
+    def test_record_replay(self) -> None:
+        self.record()
+        # the server is no longer needed
+        self.server_control.stop_server()
+        corpus = load_corpus(self.corpus)
+        self.assertEqual(len(corpus), 2 + len(ENDPOINT_HTML_PARSERS))
+        for response in corpus:
+            self.assertEqual(response.url, f"http://{self.url}")
+            self.assertIsNotNone(response.body)
+            self.assertGreaterEqual(response.elapsed, 0)
+
+        async def replay(mode: ConnectionMode) -> SyncThru:
+            syncthru = SyncThru(self.url, ReplaySession(corpus), mode)
+            await syncthru.update()
+            return syncthru
+
+        loop = asyncio.new_event_loop()
+        syncthru = loop.run_until_complete(replay(ConnectionMode.API))
+        self.assertEqual(syncthru.raw(), RAW_STATE1)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+        syncthru = loop.run_until_complete(replay(ConnectionMode.HTML))
+        self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+
+    def test_replay_unknown_url(self) -> None:
+        async def replay() -> SyncThru:
+            syncthru = SyncThru(self.url, ReplaySession([]), ConnectionMode.AUTO)
+            await syncthru.update()
+            return syncthru
+
+        syncthru = asyncio.new_event_loop().run_until_complete(replay())
+        self.assertFalse(syncthru.is_online())
+
+    def test_benchmark(self) -> None:
+        self.record()
+        results = benchmark_corpus(load_corpus(self.corpus), repeat=2)
+        self.assertEqual(
+            set(results),
+            {
+                "/sws/app/information/home/home.json",
+                "/sws/app/information/counters/counters.json",
+                *ENDPOINT_HTML_PARSERS,
+            },
+        )
+        for result in results.values():
+            self.assertEqual(result.responses, 2)
+            self.assertGreater(result.responses_per_second, 0)
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+        self.tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
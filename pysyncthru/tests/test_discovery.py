@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+import unittest
+
+import aiohttp
+
+from pysyncthru import ConnectionMode
+from pysyncthru.discovery import DiscoveredPrinter, _iter_hosts, discover
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_HTML, RAW_STATE1
+
+ADDRESS = "127.0.0.1"
+
+
+class DiscoveryTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    port: int
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(ADDRESS)
+        self.port = self.server_control.get_port()
+
+    def discover(self, network: str, race: bool = False) -> list[DiscoveredPrinter]:
+        async def run() -> list[DiscoveredPrinter]:
+            async with aiohttp.ClientSession() as session:
+                return await discover([network], session, port=self.port, race=race)
+
+        return asyncio.new_event_loop().run_until_complete(run())
+
+    def test_discover_api(self) -> None:
+        self.assertEqual(
+            self.discover(f"{ADDRESS}/32"),
+            [
+                DiscoveredPrinter(
+                    f"{ADDRESS}:{self.port}",
+                    RAW_STATE1["identity"]["model_name"],
+                    RAW_STATE1["identity"]["serial_num"],
+                    ConnectionMode.API,
+                )
+            ],
+        )
+
+    def test_discover_html(self) -> None:
+        self.server.set_api_disabled()
+        self.assertEqual(
+            self.discover(f"{ADDRESS}/32"),
+            [
+                DiscoveredPrinter(
+                    f"{ADDRESS}:{self.port}",
+                    RAW_HTML["identity"]["model_name"],
+                    None,
+                    ConnectionMode.HTML,
+                )
+            ],
+        )
+
+    def test_discover_race(self) -> None:
+        (printer,) = self.discover(f"{ADDRESS}/32", race=True)
+        self.assertEqual(printer.connection_mode, ConnectionMode.API)
+        self.assertEqual(printer.serial_number, RAW_STATE1["identity"]["serial_num"])
+        self.server.set_api_disabled()
+        (printer,) = self.discover(f"{ADDRESS}/32", race=True)
+        self.assertEqual(printer.connection_mode, ConnectionMode.HTML)
+        self.assertEqual(printer.model, RAW_HTML["identity"]["model_name"])
+        self.server.set_blocked()
+        self.assertEqual(self.discover(f"{ADDRESS}/32", race=True), [])
+
+    def test_discover_no_syncthru(self) -> None:
+        self.server.set_blocked()
+        self.assertEqual(self.discover(f"{ADDRESS}/32"), [])
+
+    def test_discover_closed_port(self) -> None:
+        self.server_control.stop_server()
+        time.sleep(0.1)
+        self.assertEqual(self.discover(f"{ADDRESS}/32"), [])
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class IterHostsTest(unittest.TestCase):
+    def test_overlapping_networks(self) -> None:
+        hosts = list(
+            _iter_hosts(
+                [
+                    "10.0.0.0/30",
+                    "10.0.0.1",
+                    "::1",
+                    "10.0.0.0/29",
+                    "10.0.0.0",
+                    "10.0.0.0/29",
+                ]
+            )
+        )
+        # the network address of a range is only scanned if given explicitly
+        self.assertEqual(
+            hosts, [f"10.0.0.{i}" for i in range(1, 7)] + ["::1", "10.0.0.0"]
+        )
+        self.assertEqual(list(_iter_hosts([])), [])
+
+    def test_explicit_addresses(self) -> None:
+        addresses = [f"10.0.0.{i}" for i in range(4)]
+        self.assertEqual(list(_iter_hosts(addresses)), addresses)
+        self.assertEqual(list(_iter_hosts(["10.0.0.2/31"])), ["10.0.0.2", "10.0.0.3"])
+
+    def test_adjacent_networks(self) -> None:
+        # network and broadcast addresses of both networks are not scanned
+        self.assertEqual(
+            list(_iter_hosts(["10.0.0.0/30", "10.0.0.4/30"])),
+            ["10.0.0.1", "10.0.0.2", "10.0.0.5", "10.0.0.6"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib.util
+import unittest
+from typing import Any, cast
+
+import aiohttp
+import pytest
+
+from pysyncthru import SyncThru
+from pysyncthru.export import (
+    COLUMNS,
+    fleet_to_numpy,
+    snapshots_to_numpy,
+    to_arrow,
+)
+from .web_raw.web_state import RAW_COUNTER, RAW_HTML, RAW_STATE1
+
+
+def printer(host: str, data: dict[str, Any], counter: dict[str, Any]) -> SyncThru:
+    syncthru = SyncThru(host, cast(aiohttp.ClientSession, None))
+    syncthru.data_printer_status = data
+    syncthru.data_counter_status = counter
+    return syncthru
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class ColumnarExportTest(unittest.TestCase):
+    def test_fleet_to_numpy(self) -> None:
+        array = fleet_to_numpy(
+            [
+                printer("printer-a", RAW_STATE1, RAW_COUNTER),
+                printer("printer-b", RAW_HTML, {}),
+            ]
+        )
+        self.assertEqual(list(array["host"]), ["http://printer-a", "http://printer-b"])
+        self.assertEqual(list(array["model"]), ["M2070 Series", "SCX-4623 Series"])
+        self.assertEqual(list(array["state"]), [2, 1])
+        self.assertEqual(list(array["toner_black"]), [58, 66])
+        self.assertEqual(list(array["toner_cyan"]), [-1, -1])
+        self.assertEqual(list(array["drum_black"]), [-1, -1])
+        # the HTML pages do not report capacities
+        self.assertEqual(list(array["tray1_capacity"]), [150, -1])
+        self.assertEqual(list(array["tray2_capacity"]), [-1, -1])
+        self.assertEqual(list(array["print_count"]), [1337, -1])
+        self.assertEqual(list(array["copy_count"]), [42, -1])
+
+    def test_empty(self) -> None:
+        self.assertEqual(len(fleet_to_numpy([])), 0)
+
+    def test_snapshots(self) -> None:
+        # long strings are not truncated, the number of rows may be unknown
+        host = "printer-" + "a" * 100
+        array = snapshots_to_numpy(
+            (h, RAW_STATE1, RAW_COUNTER) for h in (host, "printer-b")
+        )
+        self.assertEqual(list(array["host"]), [host, "printer-b"])
+        self.assertEqual(list(array["print_count"]), [1337, 1337])
+
+    def test_to_arrow(self) -> None:
+        pytest.importorskip("pyarrow")
+        table = to_arrow(
+            fleet_to_numpy([printer("printer-a", RAW_STATE1, RAW_COUNTER)])
+        )
+        self.assertEqual(table.column_names, [name for name, _ in COLUMNS])
+        self.assertEqual(table.column("model").to_pylist(), ["M2070 Series"])
+        self.assertEqual(table.column("toner_black").to_pylist(), [58])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from typing import Iterator, cast
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru, SyncThruAPINotSupported
+from pysyncthru.fleet import PollResult, ShardedFleetPoller, poll_stream
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_COUNTER, RAW_STATE1
+
+
+class ShardedFleetPollerTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    hosts: list[str]
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server("127.0.0.1")
+        port = self.server_control.get_port()
+        self.hosts = [f"127.0.0.1:{port}", f"localhost:{port}"]
+
+    def test_poll(self) -> None:
+        with ShardedFleetPoller(
+            self.hosts, processes=2, connection_mode=ConnectionMode.API
+        ) as poller:
+            changed = poller.poll()
+            self.assertEqual(set(changed), set(self.hosts))
+            for result in changed.values():
+                self.assertEqual(result.data_printer_status, RAW_STATE1)
+                self.assertEqual(result.data_counter_status, RAW_COUNTER)
+                self.assertIsNone(result.error)
+            # nothing changed, so nothing is sent back
+            self.assertEqual(poller.poll(), {})
+            self.assertEqual(poller.snapshots, changed)
+
+            self.server.set_blocked()
+            changed = poller.poll()
+            self.assertEqual(set(changed), set(self.hosts))
+            for result in changed.values():
+                self.assertIn("SyncThruAPINotSupported", result.error or "")
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class DelayedSyncThru(SyncThru):
+    def __init__(self, delay: float, fail: bool = False) -> None:
+        super().__init__(f"printer-{delay}", cast(aiohttp.ClientSession, None))
+        self.delay = delay
+        self.fail = fail
+
+    async def update(self) -> None:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise SyncThruAPINotSupported()
+
+
+class PollStreamTest(unittest.TestCase):
+    def collect(self, printers: Iterator[SyncThru], **kwargs: int) -> list[PollResult]:
+        async def collect() -> list[PollResult]:
+            return [result async for result in poll_stream(printers, **kwargs)]
+
+        return asyncio.new_event_loop().run_until_complete(collect())
+
+    def test_completion_order(self) -> None:
+        printers = [DelayedSyncThru(0.2), DelayedSyncThru(0.0), DelayedSyncThru(0.1)]
+        results = self.collect(iter(printers))
+        self.assertEqual(
+            [r.printer for r in results], [printers[1], printers[2], printers[0]]
+        )
+        self.assertEqual([r.error for r in results], [None] * 3)
+
+    def test_errors(self) -> None:
+        results = self.collect(iter([DelayedSyncThru(0.0, fail=True)]))
+        self.assertIsInstance(results[0].error, SyncThruAPINotSupported)
+
+    def test_bounded(self) -> None:
+        started = 0
+
+        def printers() -> Iterator[SyncThru]:
+            nonlocal started
+            for i in range(100):
+                started += 1
+                yield DelayedSyncThru(0.0)
+
+        async def consume_slowly() -> int:
+            stream = poll_stream(printers(), concurrency=2, buffer_size=3)
+            await stream.__anext__()
+            await asyncio.sleep(0.1)
+            # the consumer is slow, so the stream stops taking printers
+            in_flight = started
+            await stream.aclose()
+            return in_flight
+
+        in_flight = asyncio.new_event_loop().run_until_complete(consume_slowly())
+        self.assertLessEqual(in_flight, 2 + 3 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
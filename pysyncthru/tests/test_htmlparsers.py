@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from pathlib import Path
+from typing import Any, Dict
+
+from pysyncthru.htmlparsers import (
+    ENDPOINT_HTML_PARSERS,
+    Rule,
+    RuleAction,
+    compile_rules,
+)
+
+STATE_DIR = Path(__file__).parent / "test_structure" / "state1"
+
+
+def parse(chunk_size: int) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for endpoint, parsers in ENDPOINT_HTML_PARSERS.items():
+        text = (STATE_DIR / endpoint.lstrip("/")).read_text()
+        for parser_class in parsers:
+            parser = parser_class(data)
+            for i in range(0, len(text), chunk_size):
+                parser.feed(text[i : i + chunk_size])
+            parser.close()
+    return data
+
+
+class RuleParserTest(unittest.TestCase):
+    def test_endpoint_parsers(self) -> None:
+        self.assertEqual(
+            parse(chunk_size=1 << 20),
+            {
+                "identity": {
+                    "contact": "VikTak",
+                    "host_name": "SamsungAki",
+                    "ip_address": "192.168.137.35",
+                    "location": "Viktor's office",
+                    "mac_addr": "00:15:99:85:84:A5",
+                    "model_name": "SCX-4623 Series",
+                    "speed_rate": "",
+                },
+                "toner_black": {"newError": "", "opt": 1, "remaining": 66},
+                "tray1": {"newError": "", "opt": 1},
+                "tray3": {"newError": "", "opt": 0},
+                "tray4": {"newError": "", "opt": 0},
+            },
+        )
+
+    def test_split_chunks(self) -> None:
+        whole = parse(chunk_size=1 << 20)
+        for chunk_size in (1, 7, 100):
+            self.assertEqual(parse(chunk_size), whole)
+
+    def test_custom_rules(self) -> None:
+        parser_class = compile_rules(
+            "StatusParser",
+            [
+                Rule("h1", RuleAction.TEXT, path=("status", "title")),
+                Rule("dt", RuleAction.LABEL),
+                Rule("dd", RuleAction.VALUE, (("class", None),), path=("info",)),
+            ],
+        )
+        data: Dict[str, Any] = {}
+        parser = parser_class(data)
+        parser.feed("<h1> Ready </h1><dl><dt>Paper Size:</dt><dd class=x>A4")
+        parser.feed("</dd><dt>Ignored</dt><dd>x</dd></dl>")
+        parser.close()
+        self.assertEqual(
+            data, {"status": {"title": "Ready"}, "info": {"paper_size": "A4"}}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
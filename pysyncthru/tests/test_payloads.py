@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from pysyncthru.payloads import LazyCounters, decode_json_payload
+
+COUNTERS = """{
+\tGXI_BILLING_PRINT_TOTAL_IMP_CNT: 1337,
+\t"GXI_BILLING_COPY_TOTAL_IMP_CNT" : 42,
+\tGXI_BILLING_SCAN_RATIO: 0.5
+}"""
+
+
+class LazyCountersTest(unittest.TestCase):
+    def test_lazy_access(self) -> None:
+        counters = LazyCounters.from_payload(COUNTERS)
+        assert counters is not None
+        self.assertEqual(counters["GXI_BILLING_COPY_TOTAL_IMP_CNT"], 42)
+        self.assertEqual(counters._values, {"GXI_BILLING_COPY_TOTAL_IMP_CNT": 42})
+        self.assertIsNone(counters.get("GXI_UNKNOWN"))
+        self.assertEqual(len(counters), 3)
+        self.assertEqual(dict(counters), decode_json_payload(COUNTERS))
+        self.assertEqual(counters.decode_all(), decode_json_payload(COUNTERS))
+
+    def test_not_flat(self) -> None:
+        self.assertIsNone(LazyCounters.from_payload("{a: {b: 1}}"))
+        self.assertIsNone(LazyCounters.from_payload('{a: "x, b: 2"}'))
+        self.assertIsNone(LazyCounters.from_payload("not a payload"))
+
+    def test_invalid_value(self) -> None:
+        # decoded as a whole, so that no value of an invalid payload is used
+        for payload in ("{a: 1, b: 1 2}", "{a: 1, b: }", "x {a: 1}", "{a': 1}"):
+            self.assertIsNone(LazyCounters.from_payload(payload), payload)
+        self.assertIsNone(decode_json_payload("{a: 1, b: 1 2}"))
+
+    def test_empty(self) -> None:
+        counters = LazyCounters.from_payload("{ }")
+        assert counters is not None
+        self.assertEqual(len(counters), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
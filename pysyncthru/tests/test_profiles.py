@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru
+from pysyncthru.htmlparsers import (
+    ENDPOINT_HTML_GENERAL_PROTOCOLS,
+    ENDPOINT_HTML_SUPPLIES_STATUS,
+)
+from pysyncthru.profiles import (
+    EndpointProfile,
+    ProfileRegistry,
+    merge_page,
+    page_has_data,
+)
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import (
+    SERVER_DIR,
+    SyncThruServer,
+    start_syncthru_server,
+)
+from .web_raw.web_state import RAW_HTML
+
+
+class PageTest(unittest.TestCase):
+    def test_has_data(self) -> None:
+        self.assertFalse(page_has_data({"identity": {}}))
+        self.assertTrue(page_has_data({"identity": {"location": ""}}))
+
+    def test_merge_copies(self) -> None:
+        page = {"identity": {"location": "office"}}
+        data = merge_page({"status": 1}, page)
+        data["identity"]["location"] = "changed"
+        self.assertEqual(page, {"identity": {"location": "office"}})
+        self.assertEqual(merge_page({"identity": None}, page), page)
+
+
+class EndpointProfileTest(unittest.TestCase):
+    def test_retry(self) -> None:
+        now = [0.0]
+        profile = EndpointProfile(max_misses=2, retry_interval=60, clock=lambda: now[0])
+        # only consecutive misses count
+        for has_data in (False, True, False):
+            profile.record("/page", has_data)
+        self.assertTrue(profile.serves("/page"))
+        profile.record("/page", False)
+        self.assertFalse(profile.serves("/page"))
+        now[0] += 60
+        # probed again, e.g. after a firmware update
+        self.assertTrue(profile.serves("/page"))
+        profile.record("/page", True)
+        self.assertTrue(profile.serves("/page"))
+
+
+class ProfileRegistryTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+        self.directory = tempfile.mkdtemp()
+        self.server.server_dir = Path(self.directory) / "state"
+        shutil.copytree(SERVER_DIR, self.server.server_dir)
+        # this model answers with the error page
+        (self.server.server_dir / ENDPOINT_HTML_SUPPLIES_STATUS[1:]).unlink()
+
+    def test_learned_profile(self) -> None:
+        now = [0.0]
+        registry = ProfileRegistry(
+            max_misses=1, retry_interval=7200, clock=lambda: now[0]
+        )
+
+        async def fetch() -> List[int]:
+            counts = []
+            async with aiohttp.ClientSession() as session:
+                printers = [
+                    SyncThru(self.url, session, ConnectionMode.HTML, profiles=registry)
+                    for _ in range(2)
+                ]
+                for printer in printers:
+                    await printer.update()
+                    counts.append(self.server.request_count)
+                await printers[1].update()
+                counts.append(self.server.request_count)
+                # from the reused identity page
+                self.assertEqual(
+                    printers[1].mac_address(), RAW_HTML["identity"]["mac_addr"]
+                )
+                now[0] += registry.interval(ENDPOINT_HTML_GENERAL_PROTOCOLS)
+                await printers[1].update()
+                counts.append(self.server.request_count)
+            return counts
+
+        counts = asyncio.new_event_loop().run_until_complete(fetch())
+        # the second printer skips the missing page, identity pages are reused
+        self.assertEqual(counts, [3, 5, 6, 8])
+        self.assertEqual(len(registry), 1)
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+        shutil.rmtree(self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
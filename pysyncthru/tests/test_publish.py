@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import unittest
+from typing import Any
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru
+from pysyncthru.fleet import FleetSnapshot
+from pysyncthru.publish import (
+    Broadcaster,
+    PublishingDaemon,
+    QueuePolicy,
+    Subscription,
+    Update,
+)
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_STATE1
+
+
+def state(remaining: int) -> FleetSnapshot:
+    return FleetSnapshot(
+        {"status": {"hrDeviceStatus": 2}, "toner_black": {"remaining": remaining}},
+        {},
+        None,
+    )
+
+
+def drain(subscription: Subscription) -> list[Update]:
+    updates = []
+    while (update := subscription.get_nowait()) is not None:
+        updates.append(update)
+    return updates
+
+
+class BroadcasterTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def test_changes_and_filters(self) -> None:
+        broadcaster = Broadcaster()
+        toner = broadcaster.subscribe(
+            fields=["toner_black"], policy=QueuePolicy.DROP_OLDEST
+        )
+        host_b = broadcaster.subscribe(hosts=["b"])
+        broadcaster.publish("a", state(50))
+        # unchanged snapshots are not published
+        self.assertIsNone(broadcaster.publish("a", state(50)))
+        update = broadcaster.publish("a", state(49))
+        self.assertEqual(update and update.changed, {"toner_black"})
+        broadcaster.publish("b", state(50)._replace(error="offline"))
+        self.assertEqual([u.host for u in drain(toner)], ["a", "a", "b"])
+        self.assertEqual([u.host for u in drain(host_b)], ["b"])
+        # new subscribers receive the current state
+        self.assertEqual([u.host for u in drain(broadcaster.subscribe())], ["a", "b"])
+
+    def test_invalid_filters(self) -> None:
+        broadcaster = Broadcaster()
+        with self.assertRaises(TypeError):
+            broadcaster.subscribe(hosts="printer-a")
+        with self.assertRaises(TypeError):
+            broadcaster.subscribe(fields=[1])  # type: ignore[list-item]
+        self.assertEqual(broadcaster.subscribe(hosts=("a",)).hosts, {"a"})
+
+    def test_policies(self) -> None:
+        broadcaster = Broadcaster()
+        coalesce = broadcaster.subscribe()
+        oldest = broadcaster.subscribe(max_queue=2, policy=QueuePolicy.DROP_OLDEST)
+        newest = broadcaster.subscribe(max_queue=2, policy=QueuePolicy.DROP_NEWEST)
+        for remaining in range(50, 45, -1):
+            broadcaster.publish("a", state(remaining))
+        (update,) = drain(coalesce)
+        self.assertEqual(update.snapshot, state(46))
+        self.assertIn("status", update.changed)
+        self.assertEqual(coalesce.dropped, 4)
+        self.assertEqual([u.snapshot for u in drain(oldest)], [state(47), state(46)])
+        self.assertEqual([u.snapshot for u in drain(newest)], [state(50), state(49)])
+        self.assertEqual(newest.dropped, 3)
+
+    def test_iterate_until_closed(self) -> None:
+        broadcaster = Broadcaster()
+        subscription = broadcaster.subscribe()
+
+        async def consume() -> list[str]:
+            return [update.host async for update in subscription]
+
+        async def run() -> list[str]:
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0)
+            broadcaster.publish("a", state(1))
+            await asyncio.sleep(0)
+            broadcaster.close()
+            return await task
+
+        self.assertEqual(self.loop.run_until_complete(run()), ["a"])
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+
+class PublishingDaemonTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def test_socket_subscribers(self) -> None:
+        async def run() -> list[dict[str, Any]]:
+            async with aiohttp.ClientSession() as session:
+                daemon = PublishingDaemon(
+                    [SyncThru(self.url, session, ConnectionMode.API)]
+                )
+                server = await daemon.serve()
+                port = server.sockets[0].getsockname()[1]
+                clients = [
+                    await asyncio.open_connection("127.0.0.1", port) for _ in range(3)
+                ]
+                for _, writer in clients:
+                    writer.write(b'{"fields": ["status"]}\n')
+                    await writer.drain()
+                await asyncio.sleep(0.1)
+                # one poll serves all subscribers
+                self.assertEqual(await daemon.poll_once(), 1)
+                self.assertEqual(await daemon.poll_once(), 0)
+                messages = [
+                    json.loads(await reader.readline()) for reader, _ in clients
+                ]
+                for _, writer in clients:
+                    writer.close()
+                daemon.broadcaster.close()
+                server.close()
+                await server.wait_closed()
+                return messages
+
+        messages = asyncio.new_event_loop().run_until_complete(run())
+        self.assertEqual(len(messages), 3)
+        for message in messages:
+            self.assertEqual(message["data_printer_status"], RAW_STATE1)
+            self.assertIn("status", message["changed"])
+        # two requests per poll
+        self.assertEqual(self.server.request_count, 4)
+
+    def test_invalid_requests(self) -> None:
+        async def run() -> list[dict[str, Any]]:
+            daemon = PublishingDaemon([])
+            server = await daemon.serve()
+            port = server.sockets[0].getsockname()[1]
+            replies = []
+            for request in (
+                b'{"hosts": "printer-a"}\n',
+                b'{"fields": 1}\n',
+                b'{"fields": [1]}\n',
+                b"[]\n",
+                b"{\n",
+            ):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(request)
+                replies.append(json.loads(await reader.readline()))
+                # the connection is closed after the error
+                self.assertEqual(await reader.read(), b"")
+                writer.close()
+            server.close()
+            await server.wait_closed()
+            return replies
+
+        replies = asyncio.new_event_loop().run_until_complete(run())
+        self.assertEqual(len(replies), 5)
+        for reply in replies:
+            self.assertIn("error", reply)
+        self.assertEqual(replies[0]["error"], "hosts must be a list")
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+import unittest
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru, SyncthruState
+from pysyncthru.ratelimit import RateLimiter, TokenBucket, subnet_of
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_bucket(self) -> None:
+        now = 0.0
+        bucket = TokenBucket(rate=2, burst=4, clock=lambda: now)
+        self.assertEqual(bucket.delay(4), 0)
+        bucket.take(4)
+        self.assertEqual(bucket.delay(1), 0.5)
+        now = 10
+        # refilled up to the burst size
+        self.assertEqual(bucket.delay(5), 0.5)
+        bucket.take(8)
+        self.assertEqual(bucket.delay(), 2)
+
+    def test_invalid_rate(self) -> None:
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(host_requests_per_second=0)
+
+    def test_subnet_of(self) -> None:
+        self.assertEqual(subnet_of("192.168.3.17"), "192.168.3.0/24")
+        self.assertEqual(subnet_of("192.168.3.17", 16), "192.168.0.0/16")
+        self.assertEqual(subnet_of("printer.local"), "printer.local")
+
+
+class RateLimiterTest(unittest.TestCase):
+    def acquire_all(self, limiter: RateLimiter, hosts: list[str]) -> float:
+        async def acquire() -> float:
+            start = time.monotonic()
+            await asyncio.gather(*(limiter.acquire(host) for host in hosts))
+            return time.monotonic() - start
+
+        return asyncio.new_event_loop().run_until_complete(acquire())
+
+    def test_global_limit(self) -> None:
+        limiter = RateLimiter(requests_per_second=20)
+        # the first 20 requests are the burst
+        self.assertLess(self.acquire_all(limiter, ["10.0.0.1"] * 20), 0.05)
+        self.assertGreaterEqual(self.acquire_all(limiter, ["10.0.0.2"] * 4), 0.15)
+        statistics = limiter.statistics()
+        self.assertEqual(statistics.requests, 24)
+        self.assertEqual(statistics.delayed_requests, 4)
+        self.assertGreater(statistics.delay, 0.15)
+
+    def test_site_and_host_limits(self) -> None:
+        limiter = RateLimiter(site_requests_per_second=10, host_requests_per_second=1)
+        # one request per host and different sites are not limited
+        hosts = ["10.0.0.1", "10.0.0.2", "10.0.1.1", "10.0.2.1"]
+        self.assertLess(self.acquire_all(limiter, hosts), 0.05)
+        self.assertGreaterEqual(self.acquire_all(limiter, ["10.0.0.1"]), 0.9)
+
+    def test_bytes_limit(self) -> None:
+        limiter = RateLimiter(bytes_per_second=1000)
+        self.acquire_all(limiter, ["10.0.0.1"])
+        limiter.consume_bytes("10.0.0.1", 1200)
+        self.assertGreaterEqual(self.acquire_all(limiter, ["10.0.0.1"]), 0.15)
+
+
+class SyncThruRateLimitTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def test_update(self) -> None:
+        limiter = RateLimiter(host_requests_per_second=10, host_bytes_per_second=1e6)
+
+        async def fetch() -> SyncThru:
+            async with aiohttp.ClientSession() as session:
+                syncthru = SyncThru(
+                    self.url, session, ConnectionMode.HTML, rate_limiter=limiter
+                )
+                await syncthru.update()
+                return syncthru
+
+        syncthru = asyncio.new_event_loop().run_until_complete(fetch())
+        self.assertEqual(syncthru.device_status(), SyncthruState.UNKNOWN)
+        self.assertEqual(limiter.statistics().requests, 3)
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+from pysyncthru import ConnectionMode, SyncThru, SyncthruState
+from pysyncthru.session import create_session
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_COUNTER
+
+
+class ManagedSessionTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def fetch(self) -> SyncThru:
+        async def run() -> SyncThru:
+            async with create_session() as session:
+                syncthru = SyncThru(self.url, session, ConnectionMode.API)
+                await syncthru.update()
+                return syncthru
+
+        return asyncio.new_event_loop().run_until_complete(run())
+
+    def test_update(self) -> None:
+        syncthru = self.fetch()
+        self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+        self.assertTrue(syncthru._keep_alive)
+
+    def test_connection_close_fallback(self) -> None:
+        # aiohttp itself retries a dropped idempotent request once
+        self.server.drop_connections = 2
+        syncthru = self.fetch()
+        self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+        self.assertFalse(syncthru._keep_alive)
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class KeepAliveSessionTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(keep_alive=True)
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def fetch(self, drop_connections: int = 0) -> SyncThru:
+        async def run() -> SyncThru:
+            async with create_session() as session:
+                syncthru = SyncThru(self.url, session, ConnectionMode.API)
+                await syncthru.update()
+                self.server.drop_connections = drop_connections
+                await syncthru.update()
+                return syncthru
+
+        return asyncio.new_event_loop().run_until_complete(run())
+
+    def test_reused_connections(self) -> None:
+        syncthru = self.fetch()
+        self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+        self.assertTrue(syncthru._keep_alive)
+        self.assertEqual(self.server.request_count, 4)
+        self.assertLess(self.server.connection_count, 4)
+
+    def test_dropped_reused_connection(self) -> None:
+        syncthru = self.fetch(drop_connections=2)
+        self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+        self.assertFalse(syncthru._keep_alive)
+
+    def test_unreachable_keeps_alive(self) -> None:
+        self.server_control.stop_server()
+        syncthru = self.fetch()
+        self.assertFalse(syncthru.is_online())
+        # refused connections were not dropped, keep-alive stays enabled
+        self.assertTrue(syncthru._keep_alive)
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from typing import cast
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru, SyncthruState
+from pysyncthru.alerts import AlertEngine
+from pysyncthru.snmp import (
+    END_OF_MIB_VIEW,
+    GET_BULK_REQUEST,
+    SnmpClient,
+    SnmpMessage,
+    decode_message,
+    encode_message,
+    parse_oid,
+)
+from .test_structure.server_control import Server
+from .test_structure.snmp_agent import COLOR_MIB, SnmpAgentServer, start_snmp_agent
+
+
+class SnmpCodecTest(unittest.TestCase):
+    def test_roundtrip(self) -> None:
+        message = SnmpMessage(
+            b"public",
+            GET_BULK_REQUEST,
+            2**31 - 1,
+            2,
+            8,
+            [
+                (parse_oid("1.3.6.1.2.1.1.5.0"), None),
+                (parse_oid("1.3.6.1.4.1.236.11.5.11.53.1"), -129),
+                (parse_oid("1.3.6.1.2.1.1.1.0"), b"x" * 300),
+                (parse_oid("1.3.6.1.2.1.1.2.0"), parse_oid("1.3.6.1.4.1.236")),
+                (parse_oid("1.3.6.1.2.1.1.3.0"), END_OF_MIB_VIEW),
+            ],
+        )
+        self.assertEqual(decode_message(encode_message(message)), message)
+
+    def test_malformed(self) -> None:
+        data = encode_message(SnmpMessage(b"public", GET_BULK_REQUEST, 1, 0, 0, []))
+        with self.assertRaises(ValueError):
+            decode_message(data[:-3])
+
+
+class SyncThruSnmpTest(unittest.TestCase):
+    agent: SnmpAgentServer
+    agent_control: Server
+
+    def setUp(self) -> None:
+        self.agent, self.agent_control = start_snmp_agent()
+
+    def update(self, client: SnmpClient, *hosts: str) -> list[SyncThru]:
+        async def fetch() -> list[SyncThru]:
+            session = cast(aiohttp.ClientSession, None)
+            printers = [
+                SyncThru(host, session, ConnectionMode.SNMP, snmp_client=client)
+                for host in hosts
+            ]
+            async with client:
+                await asyncio.gather(*(printer.update() for printer in printers))
+            return printers
+
+        return asyncio.new_event_loop().run_until_complete(fetch())
+
+    def test_syncthru_data(self) -> None:
+        client = SnmpClient(port=self.agent_control.get_port())
+        (printer,) = self.update(client, "127.0.0.1")
+        # a single request for all data
+        self.assertEqual(len(self.agent.requests), 1)
+        self.assertEqual(printer.device_status(), SyncthruState.NORMAL)
+        self.assertEqual(printer.device_status_details(), "Sleeping...")
+        self.assertEqual(printer.model(), "M2070 Series")
+        self.assertEqual(printer.serial_number(), "ZFAYB8KGGGG1GZP")
+        self.assertEqual(printer.hostname(), "SEC811119110648")
+        self.assertEqual(printer.location(), "Office")
+        self.assertEqual(
+            printer.toner_status(),
+            {"black": {"opt": 1, "remaining": 58, "newError": ""}},
+        )
+        self.assertEqual(printer.drum_status()["black"]["remaining"], 90)
+        trays = printer.input_tray_status()
+        self.assertEqual(set(trays), {"tray_1", "manual"})
+        self.assertEqual(trays["tray_1"]["capa"], 150)
+        self.assertEqual(printer.print_count(), 5240)
+
+    def test_large_tables(self) -> None:
+        self.agent.set_mib(COLOR_MIB)
+        # requests for 8 repetitions are too big, the tables are read in pages
+        self.agent.max_repetitions = 4
+        client = SnmpClient(port=self.agent_control.get_port())
+        (printer,) = self.update(client, "127.0.0.1")
+        self.assertGreater(len(self.agent.requests), 2)
+        self.assertEqual(
+            {
+                color: toner["remaining"]
+                for color, toner in printer.toner_status().items()
+            },
+            {"black": None, "cyan": 50, "magenta": None, "yellow": None},
+        )
+        self.assertEqual(printer.drum_status()["cyan"]["remaining"], 80)
+        self.assertEqual(set(printer.input_tray_status()), {"tray_1", "manual"})
+        # unknown levels do not raise low toner alerts
+        self.assertEqual(
+            [event.rule for event in AlertEngine().evaluate_printer(printer)], []
+        )
+
+    def test_error_status(self) -> None:
+        self.agent.max_repetitions = 0
+        client = SnmpClient(port=self.agent_control.get_port())
+        (printer,) = self.update(client, "127.0.0.1")
+        self.assertEqual(printer.device_status(), SyncthruState.OFFLINE)
+
+    def test_batching(self) -> None:
+        client = SnmpClient(port=self.agent_control.get_port())
+        printers = self.update(client, "127.0.0.1", "localhost", "127.0.0.1")
+        self.assertEqual([p.model() for p in printers], ["M2070 Series"] * 3)
+        # all requests are sent from the same socket
+        self.assertEqual(len({address for address, _ in self.agent.requests}), 1)
+        self.assertEqual(len(self.agent.requests), 3)
+
+    def test_offline(self) -> None:
+        self.agent.silent = True
+        client = SnmpClient(port=self.agent_control.get_port(), timeout=0.1)
+        (printer,) = self.update(client, "127.0.0.1")
+        self.assertEqual(printer.device_status(), SyncthruState.OFFLINE)
+        # one retry
+        self.assertEqual(len(self.agent.requests), 2)
+
+    def tearDown(self) -> None:
+        self.agent_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import socketserver
+from typing import Any, Dict, List, Tuple
+
+from pysyncthru.snmp import (
+    END_OF_MIB_VIEW,
+    GET_BULK_REQUEST,
+    GET_NEXT_REQUEST,
+    GET_REQUEST,
+    NO_SUCH_OBJECT,
+    RESPONSE,
+    TOO_BIG,
+    Oid,
+    SnmpMessage,
+    decode_message,
+    encode_message,
+    parse_oid,
+)
+from .server_control import Server
+
+# Printer MIB of a monochrome laser printer with two input trays
+PRINTER_MIB = {
+    "1.3.6.1.2.1.1.4.0": "admin@example.com",
+    "1.3.6.1.2.1.1.5.0": "SEC811119110648",
+    "1.3.6.1.2.1.1.6.0": "Office",
+    "1.3.6.1.2.1.25.3.2.1.3.1": "M2070 Series",
+    "1.3.6.1.2.1.25.3.2.1.5.1": 2,
+    "1.3.6.1.2.1.43.5.1.1.17.1": "ZFAYB8KGGGG1GZP",
+    "1.3.6.1.2.1.43.8.2.1.9.1.1": 150,
+    "1.3.6.1.2.1.43.8.2.1.9.1.2": 1,
+    "1.3.6.1.2.1.43.8.2.1.10.1.1": 100,
+    "1.3.6.1.2.1.43.8.2.1.10.1.2": 0,
+    "1.3.6.1.2.1.43.8.2.1.13.1.1": "Tray 1",
+    "1.3.6.1.2.1.43.8.2.1.13.1.2": "Manual Feeder",
+    "1.3.6.1.2.1.43.10.2.1.4.1.1": 5240,
+    "1.3.6.1.2.1.43.11.1.1.5.1.1": 3,
+    "1.3.6.1.2.1.43.11.1.1.5.1.2": 9,
+    "1.3.6.1.2.1.43.11.1.1.6.1.1": "Black Toner Cartridge",
+    "1.3.6.1.2.1.43.11.1.1.6.1.2": "Imaging Unit",
+    "1.3.6.1.2.1.43.11.1.1.8.1.1": 1500,
+    "1.3.6.1.2.1.43.11.1.1.8.1.2": 10000,
+    "1.3.6.1.2.1.43.11.1.1.9.1.1": 870,
+    "1.3.6.1.2.1.43.11.1.1.9.1.2": 9000,
+    "1.3.6.1.2.1.43.16.5.1.2.1.1": "Sleeping...",
+    "1.3.6.1.2.1.43.16.5.1.2.1.2": "",
+}
+
+# Color MFP with more supplies than one GetBulkRequest returns rows, the yellow
+# toner only reports some remaining and the black toner an unknown level
+COLOR_SUPPLIES: Dict[str, Any] = {}
+for index, (supply_type, description, capacity, level) in enumerate(
+    [
+        *((9, f"{color} Imaging Unit", 50000, 40000) for color in ("Cyan", "Black")),
+        (4, "Waste Toner Bottle", 100, 10),
+        (15, "Fuser Unit", 100000, 90000),
+        (12, "Transfer Belt", 100000, 90000),
+        (13, "Transfer Roller", 100000, 90000),
+        (3, "Black Toner Cartridge", 5000, -2),
+        (3, "Cyan Toner Cartridge", 5000, 2500),
+        (3, "Magenta Toner Cartridge", -2, 100),
+        (3, "Yellow Toner Cartridge", 5000, -3),
+    ],
+    start=1,
+):
+    COLOR_SUPPLIES[f"1.3.6.1.2.1.43.11.1.1.5.1.{index}"] = supply_type
+    COLOR_SUPPLIES[f"1.3.6.1.2.1.43.11.1.1.6.1.{index}"] = description
+    COLOR_SUPPLIES[f"1.3.6.1.2.1.43.11.1.1.8.1.{index}"] = capacity
+    COLOR_SUPPLIES[f"1.3.6.1.2.1.43.11.1.1.9.1.{index}"] = level
+COLOR_MIB = {
+    **{
+        oid: value
+        for oid, value in PRINTER_MIB.items()
+        if not oid.startswith("1.3.6.1.2.1.43.11.")
+    },
+    **COLOR_SUPPLIES,
+}
+
+
+class SnmpAgentServer(socketserver.UDPServer):
+    """SNMPv2c agent serving a fixed MIB"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.set_mib(PRINTER_MIB)
+        self.requests: List[Tuple[Tuple[str, int], SnmpMessage]] = []
+        self.silent = False
+        # larger GetBulkRequests are answered with tooBig
+        self.max_repetitions = 64
+
+    def set_mib(self, mib: Dict[str, Any]) -> None:
+        self.mib = {parse_oid(oid): value for oid, value in mib.items()}
+        self.oids = sorted(self.mib)
+
+    def next_oid(self, oid: Oid) -> Tuple[Oid, Any]:
+        index = bisect.bisect_right(self.oids, oid)
+        if index == len(self.oids):
+            return oid, END_OF_MIB_VIEW
+        return self.oids[index], self.mib[self.oids[index]]
+
+    def respond(self, request: SnmpMessage) -> SnmpMessage:
+        varbinds: List[Tuple[Oid, Any]] = []
+        if request.pdu_type == GET_REQUEST:
+            varbinds = [
+                (oid, self.mib.get(oid, NO_SUCH_OBJECT)) for oid, _ in request.varbinds
+            ]
+        elif request.pdu_type == GET_NEXT_REQUEST:
+            varbinds = [self.next_oid(oid) for oid, _ in request.varbinds]
+        elif request.pdu_type == GET_BULK_REQUEST:
+            if request.error_index > self.max_repetitions:
+                return SnmpMessage(
+                    request.community, RESPONSE, request.request_id, TOO_BIG, 0, []
+                )
+            non_repeaters = request.error_status
+            varbinds = [
+                self.next_oid(oid) for oid, _ in request.varbinds[:non_repeaters]
+            ]
+            current = [oid for oid, _ in request.varbinds[non_repeaters:]]
+            for _ in range(request.error_index):
+                row = [self.next_oid(oid) for oid in current]
+                varbinds.extend(row)
+                current = [oid for oid, _ in row]
+        return SnmpMessage(
+            request.community, RESPONSE, request.request_id, 0, 0, varbinds
+        )
+
+
+class SnmpAgentRequestHandler(socketserver.BaseRequestHandler):
+    server: SnmpAgentServer
+
+    def handle(self) -> None:
+        data, sock = self.request
+        request = decode_message(data)
+        self.server.requests.append((self.client_address, request))
+        if not self.server.silent:
+            sock.sendto(
+                encode_message(self.server.respond(request)), self.client_address
+            )
+
+
+def start_snmp_agent(address: str = "127.0.0.1") -> Tuple[SnmpAgentServer, Server]:
+    """
+    Start an SNMP agent on any open UDP port
+    :return: the agent and its controller
+    """
+    agent = SnmpAgentServer((address, 0), SnmpAgentRequestHandler)
+    control = Server(agent)
+    control.start_server()
+    return agent, control
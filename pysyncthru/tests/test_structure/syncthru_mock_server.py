@@ -1,17 +1,25 @@
 import os
 import urllib.parse
 from http import HTTPStatus
-from http.server import SimpleHTTPRequestHandler, HTTPServer
+from http.server import SimpleHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
 import posixpath
+import time
 from pathlib import Path
 from socket import socket
 from typing import Optional, Tuple, Union
 
+from .server_control import Server
+
 SERVER_DIR = (Path(__file__).parent or Path(".")) / "state1"
 
 
 class SyncThruServer(HTTPServer):
     blocked = False
+    api_disabled = False
+    # number of upcoming requests on which the connection is dropped
+    drop_connections = 0
+    request_count = 0
+    connection_count = 0
     server_dir = SERVER_DIR
 
     def set_blocked(self) -> None:
@@ -20,6 +28,9 @@ class SyncThruServer(HTTPServer):
     def unset_blocked(self) -> None:
         self.blocked = False
 
+    def set_api_disabled(self) -> None:
+        self.api_disabled = True
+
 
 class SyncThruRequestHandler(SimpleHTTPRequestHandler):
     def __init__(
@@ -31,9 +42,19 @@ class SyncThruRequestHandler(SimpleHTTPRequestHandler):
         self.server = server  # type: SyncThruServer
         super().__init__(request, client_address, server)
 
+    def setup(self) -> None:
+        super().setup()
+        self.server.connection_count += 1
+
     def do_GET(self) -> None:
-        if self.server.blocked:
+        self.server.request_count += 1
+        if self.server.drop_connections > 0:
+            self.server.drop_connections -= 1
+            self.close_connection = True
+        elif self.server.blocked:
             self.send_error(403, "Access denied because server blocked")
+        elif self.server.api_disabled and self.path.startswith("/sws/"):
+            self.send_error(404, "JSON API disabled")
         else:
             super(SyncThruRequestHandler, self).do_GET()
 
@@ -101,3 +122,41 @@ class SyncThruRequestHandler(SimpleHTTPRequestHandler):
 
         if self.command != "HEAD" and body:
             self.wfile.write(body)
+
+
+class KeepAliveSyncThruServer(ThreadingHTTPServer, SyncThruServer):
+    pass
+
+
+class KeepAliveRequestHandler(SyncThruRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+
+def start_syncthru_server(
+    address: str = "localhost", keep_alive: bool = False
+) -> Tuple[SyncThruServer, Server]:
+    """
+    Start a mock SyncThru server on any open port
+    :param keep_alive: serve HTTP/1.1 and keep connections open
+    :return: the server and its controller
+    """
+    max_retries = 10
+    r = 0
+    while True:
+        try:
+            if keep_alive:
+                server: SyncThruServer = KeepAliveSyncThruServer(
+                    (address, 0), KeepAliveRequestHandler
+                )
+            else:
+                server = SyncThruServer((address, 0), SyncThruRequestHandler)
+            break
+        except OSError:
+            if r < max_retries:
+                r += 1
+            else:
+                raise
+            time.sleep(1)
+    server_control = Server(server)
+    server_control.start_server()
+    return server, server_control
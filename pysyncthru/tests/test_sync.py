@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pysyncthru import ConnectionMode, SyncThruAPINotSupported, SyncthruState
+from pysyncthru.sync import SyncThruClient
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_COUNTER, RAW_STATE1
+
+
+class SyncThruClientTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+        self.client = SyncThruClient()
+
+    def test_fetch(self) -> None:
+        printer = self.client.fetch(self.url, ConnectionMode.API)
+        self.assertEqual(printer.device_status(), SyncthruState.NORMAL)
+        self.assertEqual(printer.model(), RAW_STATE1["identity"]["model_name"])
+        self.assertEqual(printer.raw_counter(), RAW_COUNTER)
+
+    def test_update_error(self) -> None:
+        self.server.set_blocked()
+        printer = self.client.printer(self.url, ConnectionMode.API)
+        with self.assertRaises(SyncThruAPINotSupported):
+            self.client.update(printer)
+
+    def test_update_all_from_threads(self) -> None:
+        printers = [self.client.printer(self.url, ConnectionMode.API) for _ in range(8)]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(
+                executor.map(self.client.update_all, [printers[:4], printers[4:]] * 2)
+            )
+        self.assertEqual(results, [[None] * 4] * 4)
+        for printer in printers:
+            self.assertTrue(printer.is_online())
+
+    def test_closed(self) -> None:
+        self.client.close()
+        with self.assertRaises(RuntimeError):
+            self.client.fetch(self.url)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+
+import aiohttp
+
+from pysyncthru import ConnectionMode, SyncThru, SyncthruState
+from pysyncthru.transport import (
+    AiohttpTransport,
+    Response,
+    StreamTransport,
+    Transport,
+    benchmark_transport,
+)
+from .test_structure.server_control import Server
+from .test_structure.syncthru_mock_server import SyncThruServer, start_syncthru_server
+from .web_raw.web_state import RAW_COUNTER, RAW_HTML, RAW_STATE1
+
+
+def read_response(data: bytes, max_size: int = 1024) -> tuple[Response, bool]:
+    async def read() -> tuple[Response, bool]:
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await StreamTransport._read_response(reader, max_size)
+
+    return asyncio.new_event_loop().run_until_complete(read())
+
+
+class StreamResponseTest(unittest.TestCase):
+    def test_chunked(self) -> None:
+        response, reusable = read_response(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=UTF-8\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+            b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n"
+        )
+        self.assertEqual(response, Response(b"hello world", "UTF-8", 11))
+        self.assertTrue(reusable)
+
+    def test_content_length(self) -> None:
+        response, reusable = read_response(
+            b"HTTP/1.0 200 OK\r\nContent-Length: 5\r\n\r\nhello"
+        )
+        self.assertEqual(response, Response(b"hello", None, 5))
+        self.assertFalse(reusable)
+
+    def test_close_delimited(self) -> None:
+        response, reusable = read_response(
+            b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nhello"
+        )
+        self.assertEqual(response.body, b"hello")
+        self.assertFalse(reusable)
+
+    def test_too_large(self) -> None:
+        response, _ = read_response(
+            b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello", max_size=4
+        )
+        self.assertIsNone(response.body)
+
+
+class StreamTransportTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server()
+        self.url = "localhost:{}".format(self.server_control.get_port())
+
+    def fetch(self, mode: ConnectionMode) -> SyncThru:
+        async def run() -> SyncThru:
+            transport = StreamTransport()
+            syncthru = SyncThru(self.url, transport, mode)
+            await syncthru.update()
+            await transport.close()
+            return syncthru
+
+        return asyncio.new_event_loop().run_until_complete(run())
+
+    def test_api(self) -> None:
+        syncthru = self.fetch(ConnectionMode.API)
+        self.assertEqual(syncthru.raw(), RAW_STATE1)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+        self.assertTrue(syncthru._keep_alive)
+
+    def test_html(self) -> None:
+        syncthru = self.fetch(ConnectionMode.HTML)
+        self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+
+    def test_connection_close_fallback(self) -> None:
+        self.server.drop_connections = 1
+        syncthru = self.fetch(ConnectionMode.API)
+        self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+        self.assertFalse(syncthru._keep_alive)
+
+    def test_offline(self) -> None:
+        self.server_control.stop_server()
+        syncthru = self.fetch(ConnectionMode.AUTO)
+        self.assertFalse(syncthru.is_online())
+
+    def test_benchmark(self) -> None:
+        url = f"http://{self.url}/sws/app/information/home/home.json"
+
+        async def run() -> None:
+            transports: list[Transport] = [
+                StreamTransport(),
+                AiohttpTransport(aiohttp.ClientSession()),
+            ]
+            for transport in transports:
+                result = await benchmark_transport(
+                    transport, url, requests=10, connections=1
+                )
+                await transport.close()
+                self.assertEqual(result.requests, 10)
+                self.assertGreater(result.requests_per_second, 0)
+
+        asyncio.new_event_loop().run_until_complete(run())
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+if __name__ == "__main__":
+    unittest.main()
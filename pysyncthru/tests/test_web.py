@@ -3,10 +3,17 @@
 
 # general requirements
 import unittest
+from unittest import mock
 from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Type, cast
 
 from .test_structure.server_control import Server
-from .test_structure.syncthru_mock_server import SyncThruServer, SyncThruRequestHandler
+from .test_structure.syncthru_mock_server import (
+    SyncThruServer,
+    SyncThruRequestHandler,
+    start_syncthru_server,
+)
 
 # For the server in this case
 import time
@@ -351,6 +358,293 @@ class SyncthruHTMLTest(unittest.TestCase):
         )
 
 
+class SyncthruCoalescingTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(ADDRESS)
+        self.url = "{}:{}".format(ADDRESS, self.server_control.get_port())
+
+    def run_updates(self, concurrent: int, sequential: int, **kwargs: Any) -> None:
+        async def fetch() -> None:
+            async with aiohttp.ClientSession() as session:
+                syncthru = SyncThru(
+                    self.url, session, connection_mode=ConnectionMode.API, **kwargs
+                )
+                for _ in range(sequential):
+                    await asyncio.gather(
+                        *(syncthru.update() for _ in range(concurrent))
+                    )
+                self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(fetch())
+
+    def test_concurrent_updates_coalesced(self) -> None:
+        self.run_updates(concurrent=5, sequential=1)
+        # one request for the printer and one for the counter data
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_sequential_updates_refresh(self) -> None:
+        self.run_updates(concurrent=1, sequential=2)
+        self.assertEqual(self.server.request_count, 4)
+
+    def test_min_refresh_interval(self) -> None:
+        self.run_updates(concurrent=1, sequential=3, min_refresh_interval=60)
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_stale_while_revalidate(self) -> None:
+        async def fetch() -> None:
+            async with aiohttp.ClientSession() as session:
+                syncthru = SyncThru(
+                    self.url,
+                    session,
+                    connection_mode=ConnectionMode.API,
+                    max_age=0,
+                    stale_while_revalidate=60,
+                )
+                self.assertIsNone(syncthru.age())
+                await syncthru.update()
+                age = syncthru.age()
+                assert age is not None
+                # stale data is returned at once and refreshed in the background
+                await syncthru.update()
+                self.assertEqual(self.server.request_count, 2)
+                self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+                await asyncio.sleep(0.5)
+                self.assertEqual(self.server.request_count, 4)
+                self.assertLess(syncthru.age() or 0, age + 0.5)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(fetch())
+
+    def test_revalidate_on_read(self) -> None:
+        async def fetch() -> None:
+            async with aiohttp.ClientSession() as session:
+                syncthru = SyncThru(
+                    self.url, session, connection_mode=ConnectionMode.API, max_age=60
+                )
+                # reading without data starts the first refresh
+                self.assertEqual(syncthru.device_status(), SyncthruState.INVALID)
+                await asyncio.sleep(0.5)
+                self.assertEqual(syncthru.device_status(), SyncthruState.NORMAL)
+                await syncthru.update()
+                self.assertEqual(self.server.request_count, 2)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(fetch())
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class SlowAPISyncThru(SyncThru):
+    async def _probe_api(self) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(0.5)
+        return await super()._probe_api()
+
+
+class SyncthruRaceTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(ADDRESS)
+        self.url = "{}:{}".format(ADDRESS, self.server_control.get_port())
+
+    def race(
+        self, updates: int = 1, syncthru_class: Type[SyncThru] = SyncThru
+    ) -> Tuple[SyncThru, List[int]]:
+        async def fetch() -> Tuple[SyncThru, List[int]]:
+            counts = []
+            async with aiohttp.ClientSession() as session:
+                syncthru = syncthru_class(self.url, session, race_detection=True)
+                for _ in range(updates):
+                    await syncthru.update()
+                    counts.append(self.server.request_count)
+                return syncthru, counts
+
+        return asyncio.new_event_loop().run_until_complete(fetch())
+
+    def test_race_api(self) -> None:
+        # the JSON API always wins within the grace period
+        with mock.patch("pysyncthru.RACE_GRACE_PERIOD", 10.0):
+            syncthru, counts = self.race(updates=2)
+        # the HTML fallback of the automatic mode is kept
+        self.assertEqual(syncthru.connection_mode, ConnectionMode.AUTO)
+        self.assertEqual(syncthru.raw(), RAW_STATE1)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+        # later updates do not race, printer and counter data only
+        self.assertEqual(counts[1] - counts[0], 2)
+
+    def test_race_slow_api(self) -> None:
+        async def fetch() -> Tuple[SyncThru, List[int]]:
+            counts = []
+            async with aiohttp.ClientSession() as session:
+                syncthru = SlowAPISyncThru(self.url, session, race_detection=True)
+                await syncthru.update()
+                # the HTML page is used for the first update only
+                self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+                self.assertNotIn("capability", syncthru.raw())
+                counts.append(self.server.request_count)
+                # the API probe completes in the background
+                await asyncio.sleep(1)
+                counts.append(self.server.request_count)
+                for _ in range(2):
+                    await syncthru.update()
+                    counts.append(self.server.request_count)
+                return syncthru, counts
+
+        with mock.patch("pysyncthru.RACE_GRACE_PERIOD", 0.0):
+            syncthru, counts = asyncio.new_event_loop().run_until_complete(fetch())
+        self.assertEqual(syncthru.connection_mode, ConnectionMode.AUTO)
+        self.assertEqual(syncthru.raw(), RAW_STATE1)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+        # later updates do not race, printer and counter data only
+        self.assertEqual(counts[1] - counts[0], 1)
+        self.assertEqual([counts[3] - counts[2], counts[2] - counts[1]], [2, 2])
+
+    def test_race_slow_api_unsupported(self) -> None:
+        self.server.set_api_disabled()
+
+        async def fetch() -> List[int]:
+            counts = []
+            async with aiohttp.ClientSession() as session:
+                syncthru = SlowAPISyncThru(self.url, session, race_detection=True)
+                await syncthru.update()
+                await asyncio.sleep(1)
+                counts.append(self.server.request_count)
+                await syncthru.update()
+                counts.append(self.server.request_count)
+            return counts
+
+        with mock.patch("pysyncthru.RACE_GRACE_PERIOD", 0.0):
+            counts = asyncio.new_event_loop().run_until_complete(fetch())
+        # the failed API probe rules out the JSON API, HTML pages only
+        self.assertEqual(counts[1] - counts[0], 3)
+
+    def test_race_html(self) -> None:
+        self.server.set_api_disabled()
+        syncthru, counts = self.race(updates=2)
+        # the configured mode is not changed
+        self.assertEqual(syncthru.connection_mode, ConnectionMode.AUTO)
+        self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+        # the probed home page is not requested again and the mode is kept
+        self.assertEqual(counts, [4, 4 + 3])
+
+    def test_race_offline(self) -> None:
+        self.server.set_blocked()
+        syncthru, counts = self.race(updates=2)
+        self.assertEqual(syncthru.connection_mode, ConnectionMode.AUTO)
+        # reported like without racing, the error pages are responses
+        self.assertEqual(syncthru.device_status(), SyncthruState.UNKNOWN)
+        # the race falls back to the sequential detection and is not repeated
+        self.assertEqual(counts, [2 + 5, 2 + 5 + 5])
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class SyncthruResponseSizeTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(ADDRESS)
+        self.url = "{}:{}".format(ADDRESS, self.server_control.get_port())
+
+    def test_max_response_size(self) -> None:
+        async def fetch() -> None:
+            async with aiohttp.ClientSession() as session:
+                # large enough for the counters but not for the home endpoint
+                self.syncthru = SyncThru(
+                    self.url,
+                    session,
+                    connection_mode=ConnectionMode.API,
+                    max_response_size=200,
+                )
+                await self.syncthru.update()
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(fetch())
+        self.assertFalse(self.syncthru.is_online())
+        self.assertEqual(self.syncthru.raw_counter(), RAW_COUNTER)
+
+    def test_learn_encoding(self) -> None:
+        syncthru = SyncThru(self.url, cast(aiohttp.ClientSession, None))
+        self.assertEqual(syncthru._decode_body(b"Caf\xc3\xa9", None), "Café")
+        self.assertEqual(syncthru._decode_body(b"Caf\xe9", None), "Café")
+        self.assertEqual(syncthru._encoding, "latin-1")
+        self.assertEqual(syncthru._decode_body(b"Caf\xe9", "cp1252"), "Café")
+        self.assertEqual(syncthru._encoding, "cp1252")
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args: Any, **kwargs: Any) -> "Future[Any]":
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class SyncthruExecutorTest(unittest.TestCase):
+    server: SyncThruServer
+    server_control: Server
+    url: str
+
+    def setUp(self) -> None:
+        self.server, self.server_control = start_syncthru_server(ADDRESS)
+        self.url = "{}:{}".format(ADDRESS, self.server_control.get_port())
+
+    def fetch(
+        self, connection_mode: ConnectionMode, offload_threshold: int
+    ) -> Tuple[SyncThru, int]:
+        async def fetch() -> SyncThru:
+            async with aiohttp.ClientSession() as session:
+                syncthru = SyncThru(
+                    self.url,
+                    session,
+                    connection_mode=connection_mode,
+                    executor=executor,
+                    offload_threshold=offload_threshold,
+                )
+                await syncthru.update()
+                return syncthru
+
+        with CountingExecutor(1) as executor:
+            syncthru = asyncio.new_event_loop().run_until_complete(fetch())
+        return syncthru, executor.submitted
+
+    def test_offload_api(self) -> None:
+        syncthru, submitted = self.fetch(ConnectionMode.API, 0)
+        # counters are decoded lazily on access
+        self.assertEqual(submitted, 1)
+        self.assertEqual(syncthru.raw(), RAW_STATE1)
+        self.assertEqual(syncthru.raw_counter(), RAW_COUNTER)
+
+    def test_offload_html(self) -> None:
+        syncthru, submitted = self.fetch(ConnectionMode.HTML, 0)
+        self.assertEqual(submitted, 3)
+        self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+        self.assertEqual(syncthru.mac_address(), RAW_HTML["identity"]["mac_addr"])
+
+    def test_threshold(self) -> None:
+        # only the largest page (general_protocols.htm) is offloaded
+        syncthru, submitted = self.fetch(ConnectionMode.HTML, 10000)
+        self.assertEqual(submitted, 1)
+        self.assertEqual(syncthru.model(), RAW_HTML["identity"]["model_name"])
+
+    def tearDown(self) -> None:
+        self.server_control.stop_server()
+
+
 class NonSyncthruWebTest(unittest.TestCase):
     server = None
     server_control = None  # type: Server
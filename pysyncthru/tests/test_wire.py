@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+import unittest
+
+from pysyncthru.wire import (
+    MAGIC,
+    SnapshotDecoder,
+    SnapshotEncoder,
+    WireFormatError,
+)
+from .web_raw.web_state import RAW_COUNTER, RAW_STATE1
+
+
+class WireFormatTest(unittest.TestCase):
+    def test_roundtrip_and_deltas(self) -> None:
+        encoder = SnapshotEncoder()
+        decoder = SnapshotDecoder()
+        full = encoder.encode("printer", RAW_STATE1, RAW_COUNTER)
+        (snapshot,) = decoder.feed(full)
+        self.assertEqual(snapshot.data_printer_status, RAW_STATE1)
+        self.assertEqual(snapshot.data_counter_status, RAW_COUNTER)
+        encoder.acknowledge(snapshot.host, snapshot.sequence)
+
+        data = copy.deepcopy(RAW_STATE1)
+        data["toner_black"]["remaining"] = 57
+        del data["options"]
+        counters = copy.deepcopy(RAW_COUNTER)
+        counters["GXI_BILLING_PRINT_TOTAL_IMP_CNT"] += 3
+        delta = encoder.encode("printer", data, counters)
+        (snapshot,) = decoder.feed(delta)
+        self.assertEqual(snapshot.data_printer_status, data)
+        self.assertEqual(snapshot.data_counter_status, counters)
+
+        json_size = len(json.dumps(data)) + len(json.dumps(counters))
+        self.assertLess(len(full), json_size)
+        self.assertLess(len(delta) * 10, json_size)
+
+    def test_unacknowledged_base(self) -> None:
+        encoder = SnapshotEncoder()
+        decoder = SnapshotDecoder()
+        first = encoder.encode("printer", {"a": 1}, {})
+        # without acknowledgement the frames are complete
+        second = encoder.encode("printer", {"a": 2}, {})
+        snapshots = decoder.feed(first + second)
+        self.assertEqual(
+            [s.data_printer_status for s in snapshots], [{"a": 1}, {"a": 2}]
+        )
+        encoder.acknowledge("printer", 1)
+        (snapshot,) = decoder.feed(encoder.encode("printer", {"a": 3.5, "b": [1]}, {}))
+        self.assertEqual(snapshot.data_printer_status, {"a": 3.5, "b": [1]})
+        self.assertEqual(snapshot.sequence, 3)
+
+    def test_streaming(self) -> None:
+        encoder = SnapshotEncoder()
+        stream = b"".join(
+            encoder.encode(host, RAW_STATE1, RAW_COUNTER) for host in ("a", "b")
+        )
+        decoder = SnapshotDecoder()
+        snapshots = []
+        for i in range(len(stream)):
+            snapshots.extend(decoder.feed(stream[i : i + 1]))
+        self.assertEqual([s.host for s in snapshots], ["a", "b"])
+        self.assertEqual(snapshots[1].data_printer_status, RAW_STATE1)
+
+    def test_version(self) -> None:
+        with self.assertRaises(WireFormatError):
+            SnapshotDecoder().feed(MAGIC + bytes([99]))
+        with self.assertRaises(WireFormatError):
+            SnapshotDecoder().feed(b"{}\n\n\n\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
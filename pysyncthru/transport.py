@@ -0,0 +1,357 @@
+"""Transports performing the HTTP requests to printers."""
+
+import abc
+import asyncio
+import re
+import ssl
+import sys
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# Most SyncThru firmwares only handle very few parallel connections
+DEFAULT_LIMIT_PER_HOST = 2
+DEFAULT_KEEPALIVE_TIMEOUT = 15.0
+DEFAULT_TIMEOUT = 10.0
+_CHUNK_SIZE = 64 * 1024
+
+_CHARSET_REG = re.compile(r"charset=\"?([^\";\s]+)", re.IGNORECASE)
+
+
+class TransportError(Exception):
+    """Error raised when a request to a printer failed."""
+
+
+class ConnectionDropped(TransportError):
+    """Error raised when a printer closed the connection without response."""
+
+
+class Response(NamedTuple):
+    # None if the response exceeded the maximum size
+    body: Optional[bytes]
+    charset: Optional[str]
+    # number of body bytes received from the printer
+    received: int
+
+
+class Transport(abc.ABC):
+    """Base class of the ways to send GET requests to printers."""
+
+    @abc.abstractmethod
+    async def get(self, url: str, max_size: int, keep_alive: bool = True) -> Response:
+        """
+        Request ``url``, the body is read up to ``max_size`` bytes. Without
+        ``keep_alive`` the connection is closed after the response.
+        Raises TransportError if the request failed.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class AiohttpTransport(Transport):
+    """Send requests through an aiohttp client session."""
+
+    def __init__(self, session: "aiohttp.ClientSession") -> None:
+        self.session = session
+
+    async def get(self, url: str, max_size: int, keep_alive: bool = True) -> Response:
+        import aiohttp
+
+        headers = None if keep_alive else {"Connection": "close"}
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if (
+                    response.content_length is not None
+                    and response.content_length > max_size
+                ):
+                    return Response(None, response.charset, 0)
+                # Read the raw bytes to avoid aiohttp guessing the charset
+                chunks = []
+                received = 0
+                async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if received > max_size:
+                        return Response(None, response.charset, received)
+                return Response(b"".join(chunks), response.charset, received)
+        except aiohttp.ClientConnectorError as err:
+            # the printer is unreachable, no connection was dropped
+            raise TransportError(str(err)) from err
+        except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError) as err:
+            raise ConnectionDropped(str(err)) from err
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            raise TransportError(str(err)) from err
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+class _Connection(NamedTuple):
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    idle_since: float
+
+
+class StreamTransport(Transport):
+    """
+    Minimal HTTP/1.1 client on asyncio streams.
+
+    Only supports what the embedded SyncThru web servers need: GET requests
+    without content encoding, with fixed length, chunked or close delimited
+    bodies. At most ``limit_per_host`` connections are opened to a printer,
+    idle connections are reused for ``keepalive_timeout`` seconds.
+    Must be closed from within the event loop it was used in.
+    """
+
+    def __init__(
+        self,
+        limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        timeout: float = DEFAULT_TIMEOUT,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._ssl_context = ssl_context
+        self._idle: Dict[Tuple[str, int, bool], List[_Connection]] = {}
+        self._slots: Dict[Tuple[str, int, bool], asyncio.Semaphore] = {}
+
+    def _idle_connection(
+        self, key: Tuple[str, int, bool]
+    ) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        idle = self._idle.get(key)
+        now = time.monotonic()
+        while idle:
+            reader, writer, idle_since = idle.pop()
+            # skip expired connections and those closed by the printer
+            if now - idle_since < self.keepalive_timeout and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    async def get(self, url: str, max_size: int, keep_alive: bool = True) -> Response:
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        key = (parts.hostname or "", parts.port or (443 if secure else 80), secure)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        head = (
+            f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+            "Accept-Encoding: identity\r\n"
+        )
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        request = f"{head}\r\n".encode("latin-1")
+
+        if key not in self._slots:
+            self._slots[key] = asyncio.Semaphore(self.limit_per_host)
+        async with self._slots[key]:
+            try:
+                return await asyncio.wait_for(
+                    self._request(key, request, max_size, keep_alive), self.timeout
+                )
+            except asyncio.TimeoutError as err:
+                raise TransportError(f"Request to {url} timed out") from err
+
+    async def _request(
+        self,
+        key: Tuple[str, int, bool],
+        request: bytes,
+        max_size: int,
+        keep_alive: bool,
+    ) -> Response:
+        connection = self._idle_connection(key)
+        if connection is None:
+            host, port, secure = key
+            try:
+                connection = await asyncio.open_connection(
+                    host,
+                    port,
+                    ssl=(self._ssl_context or ssl.create_default_context())
+                    if secure
+                    else None,
+                )
+            except OSError as err:
+                raise TransportError(str(err)) from err
+        reader, writer = connection
+        try:
+            writer.write(request)
+            response, reusable = await self._read_response(reader, max_size)
+        except (ConnectionError, asyncio.IncompleteReadError) as err:
+            writer.close()
+            raise ConnectionDropped(str(err)) from err
+        except (OSError, ValueError) as err:
+            writer.close()
+            raise TransportError(str(err)) from err
+        except BaseException:
+            writer.close()
+            raise
+        if reusable and keep_alive:
+            self._idle.setdefault(key, []).append(
+                _Connection(reader, writer, time.monotonic())
+            )
+        else:
+            writer.close()
+        return response
+
+    @staticmethod
+    async def _read_response(
+        reader: asyncio.StreamReader, max_size: int
+    ) -> Tuple[Response, bool]:
+        """Read a response, returns it and whether the connection is reusable."""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionDropped("Connection closed without response")
+        version = status_line.split(b" ", 1)[0]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        reusable = connection == "keep-alive" or (
+            version == b"HTTP/1.1" and connection != "close"
+        )
+        match = _CHARSET_REG.search(headers.get("content-type", ""))
+        charset = match.group(1) if match else None
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            received = 0
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0], 16)
+                if size == 0:
+                    # skip trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                received += size
+                if received > max_size:
+                    return Response(None, charset, received), False
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return Response(b"".join(chunks), charset, received), reusable
+
+        if "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > max_size:
+                return Response(None, charset, 0), False
+            body = await reader.readexactly(length)
+            return Response(body, charset, length), reusable
+
+        # delimited by the end of the connection
+        chunks = []
+        received = 0
+        while True:
+            chunk = await reader.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+            if received > max_size:
+                return Response(None, charset, received), False
+        return Response(b"".join(chunks), charset, received), False
+
+    async def close(self) -> None:
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.writer.close()
+        self._idle.clear()
+
+
+class TransportBenchmark(NamedTuple):
+    requests: int
+    seconds: float
+    # traced memory held per idle open connection, in bytes
+    connection_memory: float
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.seconds if self.seconds else float("inf")
+
+
+async def benchmark_transport(
+    transport: Transport,
+    url: str,
+    requests: int = 1000,
+    connections: int = 8,
+    max_size: int = 4 * 1024 * 1024,
+) -> TransportBenchmark:
+    """
+    Measure the memory per connection after opening ``connections``
+    connections at once and the throughput of ``requests`` requests over
+    them. The transport must allow at least ``connections`` connections
+    to the host.
+    """
+    # one-time setup of the transport is not part of the measurement
+    await transport.get(url, max_size)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        responses = await asyncio.gather(
+            *(transport.get(url, max_size) for _ in range(connections))
+        )
+        del responses
+        connection_memory = (tracemalloc.get_traced_memory()[0] - before) / connections
+    finally:
+        tracemalloc.stop()
+
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await transport.get(url, max_size)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    return TransportBenchmark(requests, time.perf_counter() - start, connection_memory)
+
+
+async def _compare_transports(
+    url: str, requests: int, connections: int
+) -> Dict[str, TransportBenchmark]:
+    import aiohttp
+
+    results = {}
+    transports: Dict[str, Transport] = {
+        "aiohttp": AiohttpTransport(
+            aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=connections)
+            )
+        ),
+        "streams": StreamTransport(limit_per_host=connections),
+    }
+    for name, transport in transports.items():
+        try:
+            results[name] = await benchmark_transport(
+                transport, url, requests, connections
+            )
+        finally:
+            await transport.close()
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3, 4):
+        print(f"Usage: {sys.argv[0]} URL [REQUESTS] [CONNECTIONS]", file=sys.stderr)
+        sys.exit(1)
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    connections = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    results = asyncio.run(_compare_transports(sys.argv[1], requests, connections))
+    for name, result in results.items():
+        print(
+            f"{name}: {result.requests_per_second:.1f} requests/s, "
+            f"{result.connection_memory / 1024:.1f} KiB per connection"
+        )
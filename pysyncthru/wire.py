@@ -0,0 +1,390 @@
+"""Compact delta encoded binary format for shipping printer snapshots."""
+
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from . import SyncThru
+
+MAGIC = b"STWF"
+VERSION = 1
+# strings up to this length are sent once per stream and referenced later
+MAX_TABLE_STRING = 64
+MAX_TABLE_SIZE = 65536
+# sent snapshots kept per printer while waiting for an acknowledgement
+DEFAULT_MAX_PENDING = 16
+
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_INT_DELTA = 4
+_FLOAT = 5
+_STRING = 6
+_TEXT = 7
+_LIST = 8
+_DICT = 9
+_DOUBLE = struct.Struct("<d")
+
+# values by their path of keys
+Flat = Dict[Tuple[str, ...], Any]
+
+
+class WireFormatError(ValueError):
+    """Error raised when a stream cannot be decoded."""
+
+
+class WireSnapshot(NamedTuple):
+    host: str
+    # acknowledge this to the encoder to use the snapshot as delta base
+    sequence: int
+    data_printer_status: Dict[str, Any]
+    data_counter_status: Dict[str, Any]
+
+
+def _flatten(
+    data: Dict[str, Any], prefix: Tuple[str, ...] = (), flat: Optional[Flat] = None
+) -> Flat:
+    if flat is None:
+        flat = {}
+    for key, value in data.items():
+        path = (*prefix, key)
+        if isinstance(value, dict) and value:
+            _flatten(value, path, flat)
+        else:
+            flat[path] = value
+    return flat
+
+
+def _unflatten(flat: Flat) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for path, value in flat.items():
+        *parents, key = path
+        node = data
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return data
+
+
+def _changed(value: Any, base: Any) -> bool:
+    # 1 == True == 1.0, so compare types as well
+    return type(value) is not type(base) or value != base
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+class _StringTable:
+    """Strings sent in a stream so far, mirrored by encoder and decoder."""
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self.indices: Dict[str, int] = {}
+
+    def add(self, value: str) -> None:
+        if len(self.strings) < MAX_TABLE_SIZE:
+            self.indices[value] = len(self.strings)
+            self.strings.append(value)
+
+
+class SnapshotEncoder:
+    """
+    Encode snapshots of printers into a stream of frames.
+
+    Each frame only contains the values that changed since the snapshot of
+    the printer last acknowledged by the collector (all values if none was
+    acknowledged yet), integers are sent as varint increments. Keys and
+    short strings are sent once per stream and referenced afterwards.
+    The frames must be decoded in order by one :class:`SnapshotDecoder`.
+    """
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        self.max_pending = max_pending
+        self._strings = _StringTable()
+        self._started = False
+        self._sequences: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[int, Tuple[Flat, Flat]]] = {}
+        self._acknowledged: Dict[str, Tuple[int, Flat, Flat]] = {}
+
+    def _write_string(self, out: bytearray, value: str) -> None:
+        index = self._strings.indices.get(value)
+        if index is not None:
+            _write_varint(out, index + 1)
+            return
+        encoded = value.encode()
+        out.append(0)
+        _write_varint(out, len(encoded))
+        out += encoded
+        self._strings.add(value)
+
+    def _write_path(self, out: bytearray, path: Tuple[str, ...]) -> None:
+        _write_varint(out, len(path))
+        for key in path:
+            self._write_string(out, key)
+
+    def _write_value(self, out: bytearray, value: Any, base: Any = None) -> None:
+        if value is None:
+            out.append(_NONE)
+        elif value is True or value is False:
+            out.append(_TRUE if value else _FALSE)
+        elif type(value) is int:
+            if type(base) is int:
+                out.append(_INT_DELTA)
+                _write_varint(out, _zigzag(value - base))
+            else:
+                out.append(_INT)
+                _write_varint(out, _zigzag(value))
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            if len(value) <= MAX_TABLE_STRING:
+                out.append(_STRING)
+                self._write_string(out, value)
+            else:
+                encoded = value.encode()
+                out.append(_TEXT)
+                _write_varint(out, len(encoded))
+                out += encoded
+        elif isinstance(value, list):
+            out.append(_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self._write_value(out, item)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                self._write_string(out, key)
+                self._write_value(out, item)
+        else:
+            raise TypeError(f"Cannot encode {value!r}")
+
+    def _write_section(self, out: bytearray, flat: Flat, base: Flat) -> None:
+        changed = [
+            (key, value)
+            for key, value in flat.items()
+            if key not in base or _changed(value, base[key])
+        ]
+        _write_varint(out, len(changed))
+        for key, value in changed:
+            self._write_path(out, key)
+            self._write_value(out, value, base.get(key))
+        removed = [key for key in base if key not in flat]
+        _write_varint(out, len(removed))
+        for key in removed:
+            self._write_path(out, key)
+
+    def encode(
+        self,
+        host: str,
+        data_printer_status: Dict[str, Any],
+        data_counter_status: Dict[str, Any],
+    ) -> bytes:
+        """Encode a snapshot, the stream header is prepended to the first."""
+        out = bytearray()
+        if not self._started:
+            out += MAGIC
+            out.append(VERSION)
+            self._started = True
+        sequence = self._sequences.get(host, 0) + 1
+        self._sequences[host] = sequence
+        data, counters = _flatten(data_printer_status), _flatten(data_counter_status)
+        base_sequence, base_data, base_counters = self._acknowledged.get(
+            host, (0, {}, {})
+        )
+
+        frame = bytearray()
+        self._write_string(frame, host)
+        _write_varint(frame, sequence)
+        _write_varint(frame, base_sequence)
+        self._write_section(frame, data, base_data)
+        self._write_section(frame, counters, base_counters)
+        _write_varint(out, len(frame))
+        out += frame
+
+        pending = self._pending.setdefault(host, {})
+        pending[sequence] = (data, counters)
+        if len(pending) > self.max_pending:
+            del pending[min(pending)]
+        return bytes(out)
+
+    def encode_printer(self, printer: SyncThru) -> bytes:
+        return self.encode(printer.url, printer.raw(), printer.raw_counter())
+
+    def acknowledge(self, host: str, sequence: int) -> None:
+        """Use the acknowledged snapshot as base of the following frames."""
+        pending = self._pending.get(host, {})
+        if sequence not in pending:
+            return
+        data, counters = pending[sequence]
+        self._acknowledged[host] = (sequence, data, counters)
+        for old in [s for s in pending if s <= sequence]:
+            del pending[old]
+
+
+class SnapshotDecoder:
+    """
+    Decode a stream of frames fed in arbitrary pieces.
+
+    ``max_pending`` must not be lower than the one of the encoder.
+    """
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        self.max_pending = max_pending
+        self._strings = _StringTable()
+        self._buffer = bytearray()
+        self._started = False
+        self._snapshots: Dict[str, Dict[int, Tuple[Flat, Flat]]] = {}
+
+    def feed(self, data: bytes) -> List[WireSnapshot]:
+        """Return the snapshots of all frames completed by ``data``."""
+        self._buffer += data
+        if not self._started:
+            if len(self._buffer) < len(MAGIC) + 1:
+                return []
+            if self._buffer[: len(MAGIC)] != MAGIC:
+                raise WireFormatError("Not a snapshot stream")
+            version = self._buffer[len(MAGIC)]
+            if version != VERSION:
+                raise WireFormatError(f"Unsupported format version {version}")
+            del self._buffer[: len(MAGIC) + 1]
+            self._started = True
+
+        snapshots = []
+        offset = 0
+        while True:
+            try:
+                length, start = self._read_varint(self._buffer, offset)
+            except WireFormatError:
+                break
+            if start + length > len(self._buffer):
+                break
+            snapshots.append(
+                self._decode_frame(bytes(self._buffer[start : start + length]))
+            )
+            offset = start + length
+        del self._buffer[:offset]
+        return snapshots
+
+    @staticmethod
+    def _read_varint(data: Union[bytes, bytearray], offset: int) -> Tuple[int, int]:
+        value = 0
+        shift = 0
+        while True:
+            if offset >= len(data):
+                raise WireFormatError("Truncated varint")
+            byte = data[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return value, offset
+            shift += 7
+
+    def _read_string(self, data: bytes, offset: int) -> Tuple[str, int]:
+        index, offset = self._read_varint(data, offset)
+        if index:
+            try:
+                return self._strings.strings[index - 1], offset
+            except IndexError:
+                raise WireFormatError("Unknown string reference") from None
+        length, offset = self._read_varint(data, offset)
+        value = data[offset : offset + length].decode()
+        self._strings.add(value)
+        return value, offset + length
+
+    def _read_path(self, data: bytes, offset: int) -> Tuple[Tuple[str, ...], int]:
+        length, offset = self._read_varint(data, offset)
+        path = []
+        for _ in range(length):
+            key, offset = self._read_string(data, offset)
+            path.append(key)
+        return tuple(path), offset
+
+    def _read_value(
+        self, data: bytes, offset: int, base: Any = None
+    ) -> Tuple[Any, int]:
+        kind = data[offset]
+        offset += 1
+        if kind == _NONE:
+            return None, offset
+        if kind in (_FALSE, _TRUE):
+            return kind == _TRUE, offset
+        if kind in (_INT, _INT_DELTA):
+            value, offset = self._read_varint(data, offset)
+            value = _unzigzag(value)
+            if kind == _INT_DELTA:
+                if type(base) is not int:
+                    raise WireFormatError("Increment without base value")
+                value += base
+            return value, offset
+        if kind == _FLOAT:
+            return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+        if kind == _STRING:
+            return self._read_string(data, offset)
+        if kind == _TEXT:
+            length, offset = self._read_varint(data, offset)
+            return data[offset : offset + length].decode(), offset + length
+        if kind == _LIST:
+            length, offset = self._read_varint(data, offset)
+            items = []
+            for _ in range(length):
+                item, offset = self._read_value(data, offset)
+                items.append(item)
+            return items, offset
+        if kind == _DICT:
+            length, offset = self._read_varint(data, offset)
+            mapping = {}
+            for _ in range(length):
+                key, offset = self._read_string(data, offset)
+                mapping[key], offset = self._read_value(data, offset)
+            return mapping, offset
+        raise WireFormatError(f"Unknown value type {kind}")
+
+    def _read_section(self, data: bytes, offset: int, base: Flat) -> Tuple[Flat, int]:
+        flat = dict(base)
+        changed, offset = self._read_varint(data, offset)
+        for _ in range(changed):
+            key, offset = self._read_path(data, offset)
+            flat[key], offset = self._read_value(data, offset, base.get(key))
+        removed, offset = self._read_varint(data, offset)
+        for _ in range(removed):
+            key, offset = self._read_path(data, offset)
+            flat.pop(key, None)
+        return flat, offset
+
+    def _decode_frame(self, frame: bytes) -> WireSnapshot:
+        try:
+            host, offset = self._read_string(frame, 0)
+            sequence, offset = self._read_varint(frame, offset)
+            base_sequence, offset = self._read_varint(frame, offset)
+            snapshots = self._snapshots.setdefault(host, {})
+            if base_sequence:
+                if base_sequence not in snapshots:
+                    raise WireFormatError(f"Unknown base snapshot of {host}")
+                base_data, base_counters = snapshots[base_sequence]
+            else:
+                base_data, base_counters = {}, {}
+            data, offset = self._read_section(frame, offset, base_data)
+            counters, offset = self._read_section(frame, offset, base_counters)
+        except (IndexError, UnicodeDecodeError, struct.error) as err:
+            raise WireFormatError("Malformed frame") from err
+        snapshots[sequence] = (data, counters)
+        # later frames are based on this base or on one of the snapshots
+        # still pending at the encoder
+        recent = sorted(snapshots)[-self.max_pending :]
+        for old in [s for s in snapshots if s != base_sequence and s not in recent]:
+            del snapshots[old]
+        return WireSnapshot(host, sequence, _unflatten(data), _unflatten(counters))